@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import threading
+from urllib.parse import quote
+from dataclasses import dataclass
+
+# =============================
+# 静态资源清单：启动时扫描一次 static/ 下的片段、封面和演示视频，
+# 之后由后台线程监视目录变化并刷新，页面渲染时不再逐个 os.path.exists
+# =============================
+STATIC_ROOT = "static"
+CLIP_DIR = os.path.join(STATIC_ROOT, "video_cache")
+COVER_DIR = os.path.join(STATIC_ROOT, "images")
+DEMO_DIR = os.path.join(STATIC_ROOT, "videos")
+# 预览图由 previews.py 生成，属于可选资源：缺失时不报错，只是不显示悬停预览
+PREVIEW_DIR = os.path.join(STATIC_ROOT, "previews")
+# 封面变体由 covers.py 生成，.index.json 记录每个封面对应的源图哈希与变体列表；缺失或过期时退回原图
+COVER_VARIANT_DIR = os.path.join(STATIC_ROOT, "covers")
+COVER_VARIANT_INDEX = os.path.join(COVER_VARIANT_DIR, ".index.json")
+WATCH_DIRS = (CLIP_DIR, COVER_DIR, DEMO_DIR, PREVIEW_DIR, COVER_VARIANT_DIR)
+# 时长探测结果缓存在这里，按 (大小, 修改时间) 判断是否需要重新探测
+PROBE_CACHE_PATH = os.path.join("data", "asset_probe_cache.json")
+WATCH_INTERVAL = 3.0
+
+# 码率阶梯：convert_to_mp4.py 按此生成，页面按实际显示宽度挑选最小够用的一档。
+# height 为 None 表示源分辨率（文件名不带后缀）
+RENDITIONS = [
+    {"name": "360p", "height": 360, "crf": 28, "maxrate": "700k", "bufsize": "1400k"},
+    {"name": "720p", "height": 720, "crf": 24, "maxrate": "2500k", "bufsize": "5000k"},
+    {"name": "source", "height": None, "crf": 21, "maxrate": None, "bufsize": None},
+]
+
+def clip_filename(prefix, evt_id, gif_seconds):
+    return f"{prefix}_evt_{evt_id}_{gif_seconds}s.mp4"
+
+def cover_filename(prefix):
+    return f"{prefix}_cover.png"
+
+def demo_filename(prefix):
+    return f"{prefix}_demo.mp4"
+
+def rendition_filename(filename, name):
+    if name == "source":
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{name}{ext}"
+
+def is_rendition_filename(filename):
+    stem = os.path.splitext(filename)[0]
+    return any(stem.endswith(f"_{r['name']}") for r in RENDITIONS if r["height"])
+
+def poster_filename(prefix, evt_id):
+    return f"{prefix}_evt_{evt_id}_poster.jpg"
+
+def sprite_filename(prefix):
+    return f"{prefix}_sprite.jpg"
+
+def cover_variant_filename(prefix, digest, width, ext):
+    return f"{prefix}_cover_{digest[:12]}_{width}w.{ext}"
+
+def static_url(file_path, mtime=None):
+    # static/ 目录下的文件由 Streamlit 挂载在 app/static/ 路径下（.streamlit/config.toml 中开启），
+    # 服务端支持 Range 请求。URL 以文件修改时间作为版本号：内容不变时 URL 不变，
+    # 重复访问直接命中浏览器缓存；文件更新后 URL 随之变化
+    rel_path = os.path.relpath(file_path, STATIC_ROOT).replace(os.sep, "/")
+    version = int(mtime if mtime is not None else os.path.getmtime(file_path))
+    return f"app/static/{quote(rel_path)}?v={version}"
+
+@dataclass(frozen=True)
+class AssetInfo:
+    path: str
+    size: int
+    mtime: float
+    duration: float = None
+    width: int = None
+    height: int = None
+    # 同一视频的低分辨率档位（见 RENDITIONS）
+    renditions: tuple = ()
+
+    @property
+    def url(self):
+        return static_url(self.path, self.mtime)
+
+    def for_width(self, display_width):
+        # 选择宽度不小于显示宽度的最小档位；都不够宽时用最大的一档
+        candidates = sorted((r for r in (self, *self.renditions) if r.width), key=lambda r: r.width)
+        if not candidates:
+            return self
+        for r in candidates:
+            if r.width >= display_width:
+                return r
+        return candidates[-1]
+
+def _scan_dir(path):
+    # {文件名: (大小, 修改时间)}，隐藏文件（.DS_Store、转换 manifest 等）不计入
+    files = {}
+    if not os.path.isdir(path):
+        return files
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_file() and not entry.name.startswith("."):
+                st = entry.stat()
+                files[entry.name] = (st.st_size, st.st_mtime)
+    return files
+
+def _load_cover_index():
+    try:
+        with open(COVER_VARIANT_INDEX, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _load_probe_cache():
+    if not os.path.exists(PROBE_CACHE_PATH):
+        return {}
+    try:
+        with open(PROBE_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_probe_cache(cache):
+    os.makedirs(os.path.dirname(PROBE_CACHE_PATH), exist_ok=True)
+    tmp_path = f"{PROBE_CACHE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, PROBE_CACHE_PATH)
+
+class AssetManifest:
+    def __init__(self, games, probe=True):
+        self._games = games
+        self._probe = probe
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.clips = {}
+        self.covers = {}
+        self.demos = {}
+        self.posters = {}
+        self.sprites = {}
+        self.cover_variant_sets = {}
+        self.orphans = []
+        self.missing = []
+        self.built_at = None
+        self.refresh()
+
+    def _dir_state(self):
+        # 目录修改时间 + 游戏数据版本，任一变化都需要重新扫描
+        dirs = tuple(os.stat(d).st_mtime_ns if os.path.isdir(d) else 0 for d in WATCH_DIRS)
+        return dirs, getattr(self._games, "version", None)
+
+    def refresh(self):
+        # EventIndex 依赖 pandas，推迟到真正扫描时才导入，只引用文件名工具的模块（如主页）不受影响
+        from event_index import EventIndex
+
+        state = self._dir_state()
+        listings = {d: _scan_dir(d) for d in WATCH_DIRS}
+        probe_cache = _load_probe_cache()
+        cover_index = _load_cover_index()
+        probe_dirty = False
+
+        def info(directory, name):
+            nonlocal probe_dirty
+            stat = listings[directory].get(name)
+            if stat is None:
+                return None
+            path = os.path.join(directory, name)
+            meta = {}
+            if self._probe and name.endswith(".mp4"):
+                key = f"{path}|{stat[0]}|{stat[1]}"
+                if not isinstance(probe_cache.get(key), dict):
+                    from ffmpeg_utils import probe_video
+                    probe_cache[key] = probe_video(path)
+                    probe_dirty = True
+                meta = probe_cache[key]
+            renditions = ()
+            if name.endswith(".mp4") and not is_rendition_filename(name):
+                names = [rendition_filename(name, r["name"]) for r in RENDITIONS if r["height"]]
+                referenced[directory].update(names)
+                renditions = tuple(filter(None, (info(directory, n) for n in names)))
+            return AssetInfo(path, stat[0], stat[1], meta.get("duration"), meta.get("width"), meta.get("height"), renditions)
+
+        def content_digest(asset):
+            # 文件内容的 sha256，与探测结果一样按 (大小, 修改时间) 缓存，内容不变时只计算一次
+            nonlocal probe_dirty
+            key = f"{asset.path}|{asset.size}|{asset.mtime}|sha256"
+            if not isinstance(probe_cache.get(key), str):
+                from ffmpeg_utils import file_sha256
+                probe_cache[key] = file_sha256(asset.path)
+                probe_dirty = True
+            return probe_cache[key]
+
+        clips, covers, demos, posters, sprites, cover_variant_sets = {}, {}, {}, {}, {}, {}
+        missing, referenced = [], {d: set() for d in WATCH_DIRS}
+        for name, cfg in self._games.items():
+            prefix = cfg["prefix"]
+            index = EventIndex.from_raw_events(cfg["raw_events"])
+            for evt_id in range(len(index)):
+                fname = clip_filename(prefix, evt_id, int(index.gif_seconds[evt_id]))
+                referenced[CLIP_DIR].add(fname)
+                clips[(prefix, evt_id)] = info(CLIP_DIR, fname)
+                if clips[(prefix, evt_id)] is None:
+                    missing.append(os.path.join(CLIP_DIR, fname))
+                referenced[PREVIEW_DIR].add(poster_filename(prefix, evt_id))
+                posters[(prefix, evt_id)] = info(PREVIEW_DIR, poster_filename(prefix, evt_id))
+            referenced[PREVIEW_DIR].add(sprite_filename(prefix))
+            sprites[prefix] = info(PREVIEW_DIR, sprite_filename(prefix))
+            for directory, fname, target in ((COVER_DIR, cover_filename(prefix), covers), (DEMO_DIR, demo_filename(prefix), demos)):
+                referenced[directory].add(fname)
+                target[prefix] = info(directory, fname)
+                if target[prefix] is None:
+                    missing.append(os.path.join(directory, fname))
+            # 只有索引记录的源图哈希与当前原图内容一致，变体才算有效。不比较修改时间：
+            # 它只属于生成变体的那份检出，新克隆的仓库里必然不同
+            cover, entry = covers[prefix], cover_index.get(prefix)
+            if cover is not None and entry and all(v["file"] in listings[COVER_VARIANT_DIR] for v in entry["variants"]) \
+                    and entry["sha256"] == content_digest(cover):
+                referenced[COVER_VARIANT_DIR].update(v["file"] for v in entry["variants"])
+                cover_variant_sets[prefix] = tuple(
+                    AssetInfo(os.path.join(COVER_VARIANT_DIR, v["file"]), *listings[COVER_VARIANT_DIR][v["file"]], width=v["width"], height=v["height"])
+                    for v in entry["variants"]
+                )
+
+        orphans = [
+            os.path.join(d, fname)
+            for d in WATCH_DIRS
+            for fname in sorted(listings[d])
+            if fname not in referenced[d]
+        ]
+        if probe_dirty:
+            _save_probe_cache(probe_cache)
+
+        with self._lock:
+            self.clips, self.covers, self.demos = clips, covers, demos
+            self.posters, self.sprites = posters, sprites
+            self.cover_variant_sets = cover_variant_sets
+            self.missing, self.orphans = missing, orphans
+            self._state = state
+            self.built_at = time.time()
+
+    def clip(self, prefix, evt_id):
+        return self.clips.get((prefix, evt_id))
+
+    def cover(self, prefix):
+        return self.covers.get(prefix)
+
+    def cover_variants(self, prefix):
+        # 封面的缩放/新格式变体；没有生成或已过期时返回空元组
+        return self.cover_variant_sets.get(prefix, ())
+
+    def demo(self, prefix):
+        return self.demos.get(prefix)
+
+    def poster(self, prefix, evt_id):
+        return self.posters.get((prefix, evt_id))
+
+    def sprite(self, prefix):
+        return self.sprites.get(prefix)
+
+    def start_watcher(self, interval=WATCH_INTERVAL):
+        # 后台线程轮询目录修改时间（增删、重命名文件都会改变它），有变化才重新扫描
+        if self._watcher is not None:
+            return
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self._dir_state() != self._state:
+                        self.refresh()
+                except Exception as e:
+                    print(f"资源清单刷新失败: {e}", file=sys.stderr)
+        self._watcher = threading.Thread(target=loop, name="asset-manifest-watcher", daemon=True)
+        self._watcher.start()
+
+def validate(manifest):
+    # 打印缺失/孤儿资源，返回缺失数量
+    print(f"===== 缺失资源 ({len(manifest.missing)}) =====")
+    for path in manifest.missing:
+        print(f"  ✗ {path}")
+    print(f"===== 未被引用的资源 ({len(manifest.orphans)}) =====")
+    for path in manifest.orphans:
+        print(f"  ? {path}")
+    total = len(manifest.clips) + len(manifest.covers) + len(manifest.demos)
+    print(f"共检查 {total} 项资源，缺失 {len(manifest.missing)} 项，孤儿 {len(manifest.orphans)} 项。")
+    return len(manifest.missing)
+
+if __name__ == "__main__":
+    # 用法：python assets.py validate   —— 在实验开始前检查资源是否齐全
+    from game_store import GAMES
+
+    if len(sys.argv) > 1 and sys.argv[1] == "validate":
+        sys.exit(1 if validate(AssetManifest(GAMES)) else 0)
+    print("用法: python assets.py validate")
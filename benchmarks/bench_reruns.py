@@ -0,0 +1,309 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from collections import defaultdict
+
+# =============================
+# 重跑延迟基准：用 Streamlit 的 AppTest 在无界面模式下回放脚本化的会话
+# （选择每个游戏、点击每个时间轴事件、通过侧边栏切换系统），记录每次 rerun 的
+# 耗时、峰值内存和各元素的负载大小，并与 benchmarks/baseline.json 对比。
+#
+# 用法（在仓库根目录执行）：
+#   python benchmarks/bench_reruns.py                       # 跑默认矩阵并与基线对比（缺少基线时以非零状态退出）
+#   python benchmarks/bench_reruns.py --games 200 --events 2000
+#   python benchmarks/bench_reruns.py --update-baseline     # 把本次结果写为新基线
+# =============================
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+RESULTS_PATH = os.path.join(REPO_ROOT, "benchmarks", "results", "latest.json")
+
+# 默认矩阵：真实目录 + 两个合成规模。(名称, 游戏数, 每个游戏的事件数)；0 表示使用真实数据
+DEFAULT_MATRIX = [("real", 0, 0), ("medium", 100, 200), ("large", 500, 2000)]
+# 判定为退化的阈值：相对基线变慢/变大超过 TOLERANCE，且绝对差值超过下面的下限
+TOLERANCE = 0.25
+MIN_WALL_MS_DELTA = 5.0
+MIN_BYTES_DELTA = 1024
+STATIC_URL_RE = re.compile(r"app/static/([^?\"')\s]+)")
+
+# =============================
+# 合成目录
+# =============================
+
+def _fmt(sec):
+    return f"{sec // 3600:02d}:{sec // 60 % 60:02d}:{sec % 60:02d}"
+
+def write_synthetic_seed(path, n_games, n_events, seed=0):
+    # 以真实目录的第一个游戏为模板，生成 n_games 个游戏、每个 n_events 个事件
+    with open(os.path.join(REPO_ROOT, "data", "games.json"), "r", encoding="utf-8") as f:
+        template = json.load(f)[0]
+    rng = random.Random(seed)
+    duration = 3600
+    games = []
+    for g in range(n_games):
+        events = []
+        for _ in range(n_events):
+            start = rng.randint(0, duration - 30)
+            end = start + rng.randint(2, 30)
+            events.append({
+                "start_time": _fmt(start), "end_time": _fmt(end), "level": rng.randint(1, 3),
+                "keywords": "合成事件", "gif_timestamp": _fmt(start + 1),
+            })
+        games.append({**template, "name": f"Synthetic Game {g:05d}", "prefix": f"Syn{g:05d}", "video_duration_str": _fmt(duration), "raw_events": events})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(games, f, ensure_ascii=False)
+
+# =============================
+# 测量
+# =============================
+
+class MediaCounter:
+    # AppTest 把 st.video / st.image 的媒体放进内存存储；包一层统计每次 rerun 写入的字节数
+    def __init__(self):
+        from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+        self.bytes = 0
+        original = MemoryMediaFileStorage.load_and_get_id
+        counter = self
+
+        def load_and_get_id(storage, path_or_data, *args, **kwargs):
+            counter.bytes += os.path.getsize(path_or_data) if isinstance(path_or_data, str) else len(path_or_data)
+            return original(storage, path_or_data, *args, **kwargs)
+
+        MemoryMediaFileStorage.load_and_get_id = load_and_get_id
+
+def element_payloads(at):
+    # 返回 ({元素类型: 序列化字节数}, 页面通过 app/static/ 引用的文件字节数)
+    sizes = defaultdict(int)
+    static_files = set()
+
+    def walk(node):
+        proto = getattr(node, "proto", None)
+        if proto is not None and hasattr(proto, "SerializeToString"):
+            sizes[getattr(node, "type", type(node).__name__)] += len(proto.SerializeToString())
+            body = getattr(proto, "body", "")
+            if isinstance(body, str):
+                static_files.update(STATIC_URL_RE.findall(body))
+        children = getattr(node, "children", None)
+        if isinstance(children, dict):
+            for child in children.values():
+                walk(child)
+
+    walk(at._tree)
+    static_bytes = sum(
+        os.path.getsize(os.path.join(REPO_ROOT, "static", p))
+        for p in static_files if os.path.exists(os.path.join(REPO_ROOT, "static", p))
+    )
+    return dict(sizes), static_bytes
+
+class Session:
+    def __init__(self, script, media, track_memory):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(os.path.join(REPO_ROOT, script), default_timeout=120)
+        self.media = media
+        self.track_memory = track_memory
+        self.records = []
+
+    def run(self, step, action=None):
+        if action is not None:
+            action(self.at)
+        self.media.bytes = 0
+        if self.track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        self.at.run()
+        wall_ms = (time.perf_counter() - start) * 1000
+        peak_kb = None
+        if self.track_memory:
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        if len(self.at.exception):
+            raise RuntimeError(f"{step}: {self.at.exception[0].message}")
+        sizes, static_bytes = element_payloads(self.at)
+        self.records.append({
+            "step": step, "wall_ms": wall_ms, "peak_kb": peak_kb,
+            "element_bytes": sum(sizes.values()), "by_element": sizes,
+            "media_bytes": self.media.bytes, "static_bytes": static_bytes,
+        })
+
+def _click(event_id, ts):
+    def action(at):
+        at.session_state["timeline_chart"] = {"selection": {"points": [{"customdata": [event_id, ts]}], "box": [], "lasso": []}}
+    return action
+
+def _clear_click(at):
+    at.session_state["timeline_chart"] = {"selection": {"points": [], "box": [], "lasso": []}}
+
+def replay_app(session, games, max_games, max_clicks):
+    # app.py：主页 -> 系统一（逐个游戏、逐个事件点击）-> 侧边栏切到系统二、系统三
+    names = list(games.keys())[:max_games]
+    session.run("home")
+    session.run("enter_system1", lambda at: at.button[0].click())
+    for name in names:
+        session.run("s1_select", lambda at, n=name: (_clear_click(at), at.selectbox(key="s1_game").set_value(n)))
+        for evt_id, e in enumerate(games[name]["raw_events"][:max_clicks]):
+            session.run("s1_click", _click(evt_id, e["gif_timestamp"]))
+    for page, key in (("系统 2", "s2_game"), ("系统 3", "s3_game")):
+        session.run("switch_system", lambda at, p=page: at.sidebar.radio[0].set_value(p))
+        for name in names:
+            session.run(f"{key[:2]}_select", lambda at, n=name, k=key: at.selectbox(key=k).set_value(n))
+
+def replay_vis(session, games, max_games, max_clicks):
+    # vis-rate-app.py：逐个游戏、逐个事件点击
+    names = list(games.keys())[:max_games]
+    session.run("vis_load")
+    for name in names:
+        session.run("vis_select", lambda at, n=name: (_clear_click(at), at.selectbox[0].set_value(n)))
+        for evt_id, e in enumerate(games[name]["raw_events"][:max_clicks]):
+            session.run("vis_click", _click(evt_id, e["gif_timestamp"]))
+
+def run_config(args):
+    # 在独立子进程中执行：游戏目录通过环境变量指向合成数据，缓存互不干扰
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, REPO_ROOT)
+    from game_store import GAMES
+
+    media = MediaCounter()
+    records = {}
+    for script, replay in (("app.py", replay_app), ("vis-rate-app.py", replay_vis)):
+        # 第一遍只计时，第二遍开启 tracemalloc 统计峰值内存（它本身会拖慢执行）
+        timing = Session(script, media, track_memory=False)
+        replay(timing, GAMES, args.max_games, args.max_clicks)
+        memory = Session(script, media, track_memory=True)
+        replay(memory, GAMES, args.max_games, args.max_clicks)
+        for rec, mem in zip(timing.records, memory.records):
+            rec["peak_kb"] = mem["peak_kb"]
+        records[script] = timing.records
+    json.dump(records, sys.stdout)
+
+# =============================
+# 汇总与对比
+# =============================
+
+def summarize(records):
+    # {脚本: {步骤: 指标}}，冷启动的第一次 rerun 单独作为一个步骤
+    summary = {}
+    for script, recs in records.items():
+        by_step = defaultdict(list)
+        for i, r in enumerate(recs):
+            by_step["cold_start" if i == 0 else r["step"]].append(r)
+        summary[script] = {
+            step: {
+                "runs": len(rs),
+                "wall_ms_p50": statistics.median(r["wall_ms"] for r in rs),
+                "wall_ms_p95": sorted(r["wall_ms"] for r in rs)[math.ceil(0.95 * len(rs)) - 1],
+                "wall_ms_max": max(r["wall_ms"] for r in rs),
+                "peak_kb_max": max((r["peak_kb"] or 0) for r in rs),
+                "element_bytes_mean": statistics.mean(r["element_bytes"] for r in rs),
+                "media_bytes_mean": statistics.mean(r["media_bytes"] for r in rs),
+                "static_bytes_mean": statistics.mean(r["static_bytes"] for r in rs),
+                "by_element_max": {k: max(r["by_element"].get(k, 0) for r in rs) for k in {k for r in rs for k in r["by_element"]}},
+            }
+            for step, rs in by_step.items()
+        }
+    return summary
+
+def compare(results, baseline):
+    # 返回退化列表 [(配置, 脚本, 步骤, 指标, 基线值, 本次值)]
+    regressions = []
+    checks = (
+        ("wall_ms_p50", MIN_WALL_MS_DELTA), ("wall_ms_p95", MIN_WALL_MS_DELTA),
+        ("element_bytes_mean", MIN_BYTES_DELTA), ("media_bytes_mean", MIN_BYTES_DELTA), ("static_bytes_mean", MIN_BYTES_DELTA),
+        ("peak_kb_max", MIN_BYTES_DELTA / 1024 * 256),
+    )
+    for config, scripts in results.items():
+        for script, steps in scripts.items():
+            for step, metrics in steps.items():
+                base = baseline.get(config, {}).get(script, {}).get(step)
+                if base is None:
+                    continue
+                for metric, min_delta in checks:
+                    old, new = base.get(metric), metrics.get(metric)
+                    if old is None or new is None:
+                        continue
+                    if new > old * (1 + TOLERANCE) and new - old > min_delta:
+                        regressions.append((config, script, step, metric, old, new))
+    return regressions
+
+def print_report(results):
+    for config, scripts in results.items():
+        print(f"\n===== {config} =====")
+        for script, steps in scripts.items():
+            print(f"[{script}]")
+            print(f"  {'步骤':<14}{'次数':>6}{'p50 ms':>10}{'p95 ms':>10}{'峰值 KB':>10}{'元素 B':>10}{'媒体 B':>11}{'静态 B':>11}")
+            for step, m in steps.items():
+                print(
+                    f"  {step:<16}{m['runs']:>6}{m['wall_ms_p50']:>10.1f}{m['wall_ms_p95']:>10.1f}{m['peak_kb_max']:>10.0f}"
+                    f"{m['element_bytes_mean']:>10.0f}{m['media_bytes_mean']:>11.0f}{m['static_bytes_mean']:>11.0f}"
+                )
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit 重跑延迟基准")
+    parser.add_argument("--games", type=int, default=None, help="合成目录的游戏数（与 --events 一起使用，替代默认矩阵）")
+    parser.add_argument("--events", type=int, default=None, help="合成目录中每个游戏的事件数")
+    parser.add_argument("--max-games", type=int, default=3, help="每个会话最多选择的游戏数")
+    parser.add_argument("--max-clicks", type=int, default=6, help="每个游戏最多点击的事件数")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_config(args)
+        return 0
+
+    matrix = DEFAULT_MATRIX if args.games is None else [(f"g{args.games}_e{args.events or 0}", args.games, args.events or 0)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, n_games, n_events in matrix:
+            env = dict(os.environ)
+            if n_games:
+                seed_path = os.path.join(tmp, f"{name}.json")
+                write_synthetic_seed(seed_path, n_games, n_events)
+                env["VISRATE_SEED"] = seed_path
+                env["VISRATE_DB"] = os.path.join(tmp, f"{name}.sqlite")
+            print(f"运行配置 {name}（游戏 {n_games or '真实'}，事件 {n_events or '真实'}）...", file=sys.stderr)
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--max-games", str(args.max_games), "--max-clicks", str(args.max_clicks)],
+                cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+            )
+            if out.returncode != 0:
+                print(out.stderr, file=sys.stderr)
+                return 2
+            results[name] = summarize(json.loads(out.stdout))
+
+    print_report(results)
+    os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+    with open(RESULTS_PATH, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n已更新基线: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        # 缺少基线时无法判断是否退化，不能当作通过
+        print(f"\n✗ 没有基线文件: {args.baseline}，先用 --update-baseline 生成并提交。", file=sys.stderr)
+        return 3
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        regressions = compare(results, json.load(f))
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项退化：")
+        for config, script, step, metric, old, new in regressions:
+            print(f"  ✗ {config} / {script} / {step} / {metric}: {old:.1f} -> {new:.1f}")
+        return 1
+    print("\n与基线相比没有退化。")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
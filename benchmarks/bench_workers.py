@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run_workers
+from load_test import RESULTS_DIR, SESSION_TTL, run_level, _free_port, _fmt
+
+# =============================
+# 多 worker 扩展性：依次用 1、2、4…… 个 worker（run_workers.start_workers，共享缓存开启）承接同样的并发会话，
+# 会话轮流固定到各 worker 上（相当于代理的粘性路由），比较吞吐量、延迟和总内存随 worker 数的变化。
+# 不经过 nginx：代理本身的开销与 worker 数无关，这里只量 Python 端的扩展性。
+#
+# 用法（在仓库根目录执行）：
+#   python benchmarks/bench_workers.py --workers 1,2,4 --sessions 16
+# 注意：吞吐量最多随 CPU 核数线性增长，worker 数超过核数后不会再提升
+# =============================
+
+def bench(n_workers, args):
+    # 每轮使用新的端口段，避免上一轮的端口仍处于 TIME_WAIT
+    base_port = _free_port()
+    workers = run_workers.start_workers(
+        n_workers, args.script, base_port=base_port,
+        log_dir=RESULTS_DIR, extra_args=("--server.disconnectedSessionTTL", str(SESSION_TTL)),
+    )
+    urls = [f"http://127.0.0.1:{port}" for port, _ in workers]
+    pids = [proc.pid for _, proc in workers]
+    try:
+        # 预热：每个 worker 走一遍，只有第一个会真正计算，其余从共享缓存读取
+        warm = argparse.Namespace(**{**vars(args), "ramp": 0, "think": 0, "settle": 0})
+        asyncio.run(run_level(urls, args.script, len(urls), warm, None))
+        result = asyncio.run(run_level(urls, args.script, args.sessions, args, pids))
+    finally:
+        run_workers.stop_workers([proc for _, proc in workers])
+    result["workers"] = n_workers
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="多 worker 吞吐量扩展性测试")
+    parser.add_argument("--workers", default="1,2,4", help="逐级测试的 worker 数，逗号分隔")
+    parser.add_argument("--sessions", type=int, default=16, help="每一级的并发会话数（各级相同）")
+    parser.add_argument("--script", default="app.py", choices=["app.py", "vis-rate-app.py"])
+    parser.add_argument("--games", type=int, default=2)
+    parser.add_argument("--clicks", type=int, default=3)
+    parser.add_argument("--think", type=float, default=0, help="思考时间（毫秒），默认 0：测量饱和吞吐量")
+    parser.add_argument("--ramp", type=float, default=1.0)
+    parser.add_argument("--settle", type=float, default=0.0)
+    parser.add_argument("--fetch-media", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "workers.json"))
+    args = parser.parse_args()
+    random.seed(args.seed)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    run_workers.ensure_static_export()
+
+    results = []
+    for n in [int(x) for x in args.workers.split(",") if x.strip()]:
+        print(f"{n} 个 worker，{args.sessions} 个并发会话...", file=sys.stderr)
+        results.append(bench(n, args))
+
+    base = results[0]["throughput_rps"] or None
+    print(f"\n===== 多 worker 扩展性（{args.script}，{args.sessions} 个会话，CPU {os.cpu_count()} 核）=====")
+    print(f"{'worker':>7}{'rerun':>8}{'错误':>6}{'rps':>8}{'加速比':>8}{'p50 ms':>9}{'p95 ms':>9}{'总内存 MB':>11}")
+    for r in results:
+        speedup = r["throughput_rps"] / base if base else None
+        print(f"{r['workers']:>7}{r['reruns']:>8}{len(r['errors']):>6}{r['throughput_rps']:>8.1f}{_fmt(speedup, '.2f'):>8}"
+              f"{_fmt(r['latency_ms']['p50']):>9}{_fmt(r['latency_ms']['p95']):>9}{_fmt(r['rss_mb']['connected']):>11}")
+    for r in results:
+        for e in r["errors"][:3]:
+            print(f"  ✗ {r['workers']} worker: {e}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"script": args.script, "sessions": args.sessions, "cpu_count": os.cpu_count(), "levels": results}, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+    return 1 if any(r["errors"] for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
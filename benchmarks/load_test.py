@@ -0,0 +1,400 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from collections import defaultdict
+
+# =============================
+# 并发压测：在本地启动 Streamlit 服务，用 N 个 websocket 会话（/_stcore/stream，BackMsg/ForwardMsg protobuf）
+# 模拟参与者的点击路径，统计每次 rerun 的延迟分位数、吞吐量上限，以及服务端 RSS 随会话数的增长
+# （每会话内存、断开后是否回落，用来发现会话级内存泄漏）。
+#
+# 用法（在仓库根目录执行）：
+#   python benchmarks/load_test.py app.py --sessions 1,5,10,25
+#   python benchmarks/load_test.py vis-rate-app.py --sessions 10 --fetch-media
+#   python benchmarks/load_test.py app.py --url http://127.0.0.1:8080 --server-pid 1234   # 压测已运行的服务
+#   python benchmarks/load_test.py app.py --url http://127.0.0.1:8601,http://127.0.0.1:8602 --server-pid 11,12
+#       # 多 worker（run_workers.py）：会话轮流分配到各 worker 并固定在上面，相当于代理的粘性路由
+# =============================
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+STATIC_URL_RE = re.compile(r"app/static/[^\"')\s]+")
+# 断开的会话在服务端保留的秒数；压测时调小，便于观察内存是否回落
+SESSION_TTL = 2
+
+def _load_protos():
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+    return BackMsg, ForwardMsg, WidgetState
+
+# =============================
+# 服务端进程与内存
+# =============================
+
+def rss_bytes(pid):
+    # 优先用 psutil（可选依赖），否则读 /proc（仅 Linux）
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+def total_rss_bytes(pids):
+    # 多 worker 时为各进程之和；任何一个取不到就返回 None
+    values = [rss_bytes(pid) for pid in pids]
+    return sum(values) if values and None not in values else None
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(script, port, log_path):
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", script,
+        "--server.headless", "true", "--server.port", str(port), "--server.address", "127.0.0.1",
+        "--server.fileWatcherType", "none", "--server.disconnectedSessionTTL", str(SESSION_TTL),
+        "--browser.gatherUsageStats", "false",
+    ]
+    log = open(log_path, "w")
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Streamlit 启动失败，日志见 {log_path}")
+        try:
+            with urllib.request.urlopen(f"{url}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc, url
+        except OSError:
+            time.sleep(0.3)
+    proc.kill()
+    raise RuntimeError("等待 Streamlit 启动超时")
+
+# =============================
+# 模拟浏览器的会话客户端
+# =============================
+
+class StreamlitSession:
+    def __init__(self, url, fetch_media=False):
+        self.ws_url = url.replace("http", "ws", 1).rstrip("/") + "/_stcore/stream"
+        self.http_url = url.rstrip("/")
+        self.fetch_media = fetch_media
+        self.ws = None
+        self.widgets = {}          # 当前页面上的控件：id -> {type, label, options, points}
+        self.values = {}           # 已设置过的控件值：id -> (字段名, 值)
+        self.media_urls = set()
+        self.page_script_hash = ""
+        self.bytes_received = 0
+        self.media_bytes = 0
+
+    async def connect(self):
+        from websockets.asyncio.client import connect
+        self.ws = await connect(self.ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=30)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def find(self, kind, key=None, label=None):
+        for wid, w in self.widgets.items():
+            if w["type"] != kind:
+                continue
+            # 带 key 的控件 ID 以 "-{key}" 结尾
+            if key is not None and not wid.endswith(f"-{key}"):
+                continue
+            if label is not None and not w["label"].startswith(label):
+                continue
+            return wid
+        return None
+
+    def set_value(self, wid, field, value):
+        self.values[wid] = (field, value)
+
+    async def rerun(self, trigger=None):
+        # 发送一次 rerun_script，等到 script_finished（中途 st.rerun 导致的提前结束不算），返回耗时秒数
+        BackMsg, ForwardMsg, WidgetState = _load_protos()
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.page_script_hash = self.page_script_hash
+        for wid, (field, value) in self.values.items():
+            if wid in self.widgets:
+                ws = WidgetState(id=wid)
+                setattr(ws, field, value)
+                state.widget_states.widgets.append(ws)
+        if trigger is not None:
+            state.widget_states.widgets.append(WidgetState(id=trigger, trigger_value=True))
+        self.media_urls = set()
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        while True:
+            data = await asyncio.wait_for(self.ws.recv(), timeout=120)
+            self.bytes_received += len(data)
+            fwd = ForwardMsg()
+            fwd.ParseFromString(data)
+            kind = fwd.WhichOneof("type")
+            if kind == "new_session":
+                self.widgets = {}
+                self.page_script_hash = fwd.new_session.page_script_hash or self.page_script_hash
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                self._track(fwd.delta.new_element)
+            elif kind == "script_finished" and fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                if fwd.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("脚本编译错误")
+                break
+        elapsed = time.perf_counter() - start
+        if self.fetch_media and self.media_urls:
+            self.media_bytes += sum(await asyncio.gather(*(asyncio.to_thread(self._fetch, u) for u in self.media_urls)))
+        return elapsed
+
+    def _track(self, element):
+        kind = element.WhichOneof("type")
+        proto = getattr(element, kind) if kind else None
+        if kind in ("selectbox", "radio"):
+            self.widgets[proto.id] = {"type": kind, "label": proto.label, "options": list(proto.options)}
+        elif kind == "button":
+            self.widgets[proto.id] = {"type": kind, "label": proto.label}
+        elif kind == "plotly_chart" and proto.id:
+            self.widgets[proto.id] = {"type": kind, "label": "", "points": _clickable_points(proto.spec)}
+        elif kind == "video" and proto.url:
+            self.media_urls.add(proto.url)
+        elif kind == "imgs":
+            self.media_urls.update(img.url for img in proto.imgs if img.url)
+        elif kind == "markdown":
+            self.media_urls.update(STATIC_URL_RE.findall(proto.body))
+
+    def _fetch(self, url):
+        full = url if url.startswith("http") else f"{self.http_url}/{url.lstrip('/')}"
+        try:
+            with urllib.request.urlopen(full, timeout=60) as r:
+                return len(r.read())
+        except OSError:
+            return 0
+
+def _clickable_points(spec):
+    # 从图表 JSON 中取出可点击的数据点 customdata（[事件 ID, GIF 时间戳, ...]）
+    points = []
+    try:
+        for trace in json.loads(spec).get("data", []):
+            custom = trace.get("customdata")
+            if isinstance(custom, list):
+                points += [c for c in custom if isinstance(c, list) and c and c[0] != -1]
+    except ValueError:
+        pass
+    return points
+
+def _click_value(point):
+    return json.dumps({"selection": {"points": [{"customdata": point}], "point_indices": [0], "box": [], "lasso": []}})
+
+# =============================
+# 点击路径
+# =============================
+
+async def _think(think_ms):
+    if think_ms:
+        await asyncio.sleep(random.expovariate(1000 / think_ms))
+
+async def path_app(session, record, games, clicks, think_ms):
+    # app.py：主页 -> 系统一（选游戏、点事件）-> 侧边栏切到系统二、系统三
+    record("load", await session.rerun())
+    await _think(think_ms)
+    record("enter_system", await session.rerun(trigger=session.find("button", label="🚀")))
+    for _ in range(games):
+        await _think(think_ms)
+        select = session.find("selectbox", key="s1_game")
+        session.set_value(select, "string_value", random.choice(session.widgets[select]["options"]))
+        record("select_game", await session.rerun())
+        for _ in range(clicks):
+            chart = session.find("plotly_chart")
+            if chart is None or not session.widgets[chart]["points"]:
+                break
+            await _think(think_ms)
+            session.set_value(chart, "string_value", _click_value(random.choice(session.widgets[chart]["points"])))
+            record("click_event", await session.rerun())
+    for page, key in (("系统 2", "s2_game"), ("系统 3", "s3_game")):
+        await _think(think_ms)
+        session.set_value(session.find("radio", label="前往"), "string_value", page)
+        record("switch_system", await session.rerun())
+        for _ in range(games):
+            await _think(think_ms)
+            select = session.find("selectbox", key=key)
+            session.set_value(select, "string_value", random.choice(session.widgets[select]["options"]))
+            record("select_game", await session.rerun())
+
+async def path_vis(session, record, games, clicks, think_ms):
+    # vis-rate-app.py：选游戏、点事件
+    record("load", await session.rerun())
+    for _ in range(games):
+        await _think(think_ms)
+        select = session.find("selectbox")
+        session.set_value(select, "string_value", random.choice(session.widgets[select]["options"]))
+        record("select_game", await session.rerun())
+        for _ in range(clicks):
+            chart = session.find("plotly_chart")
+            if chart is None or not session.widgets[chart]["points"]:
+                break
+            await _think(think_ms)
+            session.set_value(chart, "string_value", _click_value(random.choice(session.widgets[chart]["points"])))
+            record("click_event", await session.rerun())
+
+PATHS = {"app.py": path_app, "vis-rate-app.py": path_vis}
+
+# =============================
+# 压测一个并发等级
+# =============================
+
+async def run_level(url, script, n_sessions, args, server_pid):
+    # url / server_pid 也可以是列表（多 worker）：第 i 个会话连到第 i % N 个 worker，RSS 取各进程之和
+    urls = [url] if isinstance(url, str) else list(url)
+    pids = [server_pid] if isinstance(server_pid, int) else list(server_pid or [])
+    latencies = defaultdict(list)
+    errors = []
+    sessions = []
+    rss_samples = []
+    stop_sampling = asyncio.Event()
+
+    async def sample_rss():
+        while not stop_sampling.is_set() and pids:
+            rss = total_rss_bytes(pids)
+            if rss:
+                rss_samples.append(rss)
+            await asyncio.sleep(0.25)
+
+    async def one(i):
+        # 在 ramp 秒内均匀启动，避免所有会话同时握手
+        await asyncio.sleep(args.ramp * i / max(n_sessions, 1))
+        session = StreamlitSession(urls[i % len(urls)], fetch_media=args.fetch_media)
+        sessions.append(session)
+        try:
+            await session.connect()
+            await PATHS[script](session, lambda step, secs: latencies[step].append(secs), args.games, args.clicks, args.think)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+    rss_idle = total_rss_bytes(pids) if pids else None
+    sampler = asyncio.create_task(sample_rss())
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_sessions)))
+    elapsed = time.perf_counter() - start
+    # 所有会话走完点击路径、仍保持连接时的内存
+    rss_connected = total_rss_bytes(pids) if pids else None
+    await asyncio.gather(*(s.close() for s in sessions), return_exceptions=True)
+    stop_sampling.set()
+    await sampler
+    # 等服务端清理断开的会话后再量一次，回落不到空闲水平说明有会话级泄漏
+    await asyncio.sleep(SESSION_TTL + args.settle)
+    rss_after = total_rss_bytes(pids) if pids else None
+
+    all_lat = sorted(x for v in latencies.values() for x in v)
+    reruns = len(all_lat)
+
+    def pct(values, p):
+        return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000 if values else None
+
+    return {
+        "sessions": n_sessions,
+        "reruns": reruns,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": reruns / elapsed if elapsed else 0.0,
+        "latency_ms": {"p50": pct(all_lat, 50), "p95": pct(all_lat, 95), "p99": pct(all_lat, 99), "max": all_lat[-1] * 1000 if all_lat else None},
+        "by_step_p50_ms": {step: statistics.median(v) * 1000 for step, v in latencies.items()},
+        "ws_bytes": sum(s.bytes_received for s in sessions),
+        "media_bytes": sum(s.media_bytes for s in sessions),
+        "rss_mb": {
+            "idle": rss_idle and rss_idle / 2**20,
+            "peak": max(rss_samples) / 2**20 if rss_samples else None,
+            "connected": rss_connected and rss_connected / 2**20,
+            "after_disconnect": rss_after and rss_after / 2**20,
+        },
+        "rss_per_session_kb": (rss_connected - rss_idle) / 1024 / n_sessions if rss_idle and rss_connected else None,
+    }
+
+def _fmt(v, spec=".1f"):
+    return "-" if v is None else format(v, spec)
+
+def print_report(script, levels):
+    print(f"\n===== {script} 压测结果 =====")
+    print(f"{'会话':>6}{'rerun':>8}{'错误':>6}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'空闲 MB':>9}{'峰值 MB':>9}{'连接 MB':>9}{'断开 MB':>9}{'每会话 KB':>11}")
+    for r in levels:
+        lat, rss = r["latency_ms"], r["rss_mb"]
+        print(f"{r['sessions']:>6}{r['reruns']:>8}{len(r['errors']):>6}{r['throughput_rps']:>8.1f}"
+              f"{_fmt(lat['p50']):>9}{_fmt(lat['p95']):>9}{_fmt(lat['p99']):>9}"
+              f"{_fmt(rss['idle']):>9}{_fmt(rss['peak']):>9}{_fmt(rss['connected']):>9}{_fmt(rss['after_disconnect']):>9}"
+              f"{_fmt(r['rss_per_session_kb'], '.0f'):>11}")
+    best = max(levels, key=lambda r: r["throughput_rps"])
+    print(f"吞吐量上限约 {best['throughput_rps']:.1f} rerun/s（{best['sessions']} 个并发会话时）")
+    first, last = levels[0]["rss_mb"]["after_disconnect"], levels[-1]["rss_mb"]["after_disconnect"]
+    if first and last:
+        print(f"各轮断开后 RSS 从 {first:.1f} MB 变为 {last:.1f} MB（持续上涨说明可能存在会话级泄漏）")
+    for r in levels:
+        for e in r["errors"][:3]:
+            print(f"  ✗ {r['sessions']} 会话: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit 多会话并发压测")
+    parser.add_argument("script", choices=sorted(PATHS), help="被测的应用脚本")
+    parser.add_argument("--sessions", default="1,5,10,25", help="逐级测试的并发会话数，逗号分隔")
+    parser.add_argument("--games", type=int, default=2, help="每个会话选择游戏的次数")
+    parser.add_argument("--clicks", type=int, default=3, help="每个游戏点击事件的次数")
+    parser.add_argument("--think", type=float, default=300, help="两次操作之间的平均思考时间（毫秒，指数分布），0 表示连续操作")
+    parser.add_argument("--ramp", type=float, default=2.0, help="每一级内所有会话在多少秒内陆续启动")
+    parser.add_argument("--settle", type=float, default=3.0, help="断开后额外等待多少秒再测量 RSS")
+    parser.add_argument("--fetch-media", action="store_true", help="像浏览器一样下载页面引用的视频和图片")
+    parser.add_argument("--url", default=None, help="压测已运行的服务，不自动启动；多个 worker 用逗号分隔")
+    parser.add_argument("--server-pid", default=None, help="配合 --url 使用，用于统计服务端 RSS；多个进程用逗号分隔")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认 benchmarks/results/load_<脚本>.json")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    proc = None
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    if args.url:
+        url = [u.strip() for u in args.url.split(",") if u.strip()]
+        server_pid = [int(p) for p in args.server_pid.split(",")] if args.server_pid else None
+    else:
+        proc, url = start_server(args.script, _free_port(), os.path.join(RESULTS_DIR, "load_server.log"))
+        server_pid = proc.pid
+    try:
+        # 预热：第一次访问会构建缓存和资源清单，不计入结果
+        asyncio.run(run_level(url, args.script, 1, argparse.Namespace(**{**vars(args), "ramp": 0, "think": 0, "settle": 0}), None))
+        levels = []
+        for n in [int(x) for x in args.sessions.split(",") if x.strip()]:
+            print(f"并发 {n} 个会话...", file=sys.stderr)
+            levels.append(asyncio.run(run_level(url, args.script, n, args, server_pid)))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print_report(args.script, levels)
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{os.path.splitext(args.script)[0]}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"script": args.script, "url": url, "levels": levels}, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+    return 1 if any(r["errors"] for r in levels) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
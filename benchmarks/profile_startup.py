@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# =============================
+# 冷启动分析：在全新的 Python 进程中测量
+#   1. -X importtime：导入 systems（主页路径）以及系统一额外需要的 timeline / Plotly 各花多少时间，
+#      只统计 streamlit 本身导入完成之后的部分（服务进程启动时 streamlit 早已导入）
+#   2. AppTest：主页首次渲染、首次进入系统一的耗时，以及主页渲染后是否已经导入了 pandas / Plotly Express
+#
+# 用法（在仓库根目录执行）：python benchmarks/profile_startup.py [--repeat 5] [--top 15]
+# =============================
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "plotly.express", "numpy", "timeline", "event_index")
+
+def importtime(statement):
+    # 返回 (streamlit 之后导入的模块 [(名称, 自身微秒, 累计微秒, 层级)], 顶层合计微秒)
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import streamlit; {statement}"],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr[-2000:])
+    rows = []
+    seen_streamlit = False
+    for line in out.stderr.splitlines():
+        # 格式："import time: 自身 | 累计 | <缩进>模块名"，缩进每层两个空格；跳过表头
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        head, cum_us, raw_name = line.split("|")
+        if not cum_us.strip().isdigit():
+            continue
+        name = raw_name.strip()
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        if not seen_streamlit:
+            seen_streamlit = depth == 0 and name == "streamlit"
+            continue
+        rows.append((name, int(head.split(":")[1]), int(cum_us), depth))
+    total = sum(cum for _, _, cum, depth in rows if depth == 0)
+    return rows, total
+
+FIRST_PAINT = r"""
+import os, sys, time, json
+sys.path.insert(0, os.getcwd())
+from streamlit.testing.v1 import AppTest
+result = {}
+at = AppTest.from_file(os.path.join(os.getcwd(), "app.py"), default_timeout=120)
+t = time.perf_counter(); at.run(); result["home_ms"] = (time.perf_counter() - t) * 1000
+result["home_loaded"] = {m: m in sys.modules for m in %(heavy)r}
+t = time.perf_counter(); at.run(); result["home_warm_ms"] = (time.perf_counter() - t) * 1000
+t = time.perf_counter(); at.button[0].click().run(); result["system1_ms"] = (time.perf_counter() - t) * 1000
+result["errors"] = [e.message for e in at.exception]
+print(json.dumps(result))
+"""
+
+def first_paint():
+    out = subprocess.run(
+        [sys.executable, "-c", FIRST_PAINT % {"heavy": HEAVY_MODULES}],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr[-2000:])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动与导入耗时分析")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量重复的次数（取中位数）")
+    parser.add_argument("--top", type=int, default=12, help="列出自身耗时最多的前 N 个模块")
+    args = parser.parse_args()
+
+    print("===== 导入耗时（streamlit 已导入之后）=====")
+    for label, statement in (
+        ("主页：import systems", "import systems"),
+        ("系统一追加：timeline + Plotly", "import systems; import timeline; import plotly.graph_objects"),
+    ):
+        runs = [importtime(statement) for _ in range(args.repeat)]
+        total = statistics.median(t for _, t in runs)
+        print(f"\n{label}: {total / 1000:.1f} ms")
+        rows = sorted(runs[-1][0], key=lambda r: -r[1])[:args.top]
+        for name, self_us, cum_us, _ in rows:
+            print(f"  {name:<44}{self_us / 1000:>8.1f} ms 自身{cum_us / 1000:>9.1f} ms 累计")
+
+    print("\n===== AppTest 首次渲染 =====")
+    results = [first_paint() for _ in range(args.repeat)]
+    for r in results:
+        if r["errors"]:
+            print(f"  ✗ {r['errors'][0]}")
+    for key, label in (("home_ms", "主页首次渲染（冷）"), ("home_warm_ms", "主页再次渲染"), ("system1_ms", "首次进入系统一")):
+        print(f"  {label:<18}{statistics.median(r[key] for r in results):>9.1f} ms")
+    loaded = results[-1]["home_loaded"]
+    print("  主页渲染后已导入: " + "，".join(f"{m}={'是' if v else '否'}" for m, v in loaded.items()))
+    return 1 if any(r["errors"] for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
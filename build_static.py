@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import html
+import time
+import hashlib
+import inspect
+import argparse
+import functools
+
+import systems
+from systems import GAMES_DATA, CLIP_DISPLAY_WIDTH, DEMO_DISPLAY_WIDTH
+from assets import STATIC_ROOT, AssetManifest
+from covers import COVER_DISPLAY_WIDTH, picture_html
+from previews import HOVER_PREVIEW_JS, hover_preview_config
+
+# =============================
+# 静态导出：把三个系统中只取决于游戏数据的内容预先生成到 static/export/，
+#   figures/{prefix}_timeline.json  每个游戏整段时间轴的 Plotly 图表 JSON（实时应用也直接读取它）
+#   system1.html / system2.html / system3.html / index.html  纯静态页面，任何静态文件服务器都能提供；
+#     系统一在浏览器中用 Plotly.js 绘图，点击方块由页面脚本切换片段，不经过 Python
+#   manifest.json  数据版本与绘图代码版本，二者任一变化预构建结果即视为过期
+# 页面中的媒体 URL 相对 static/ 目录（../video_cache/...），因此静态服务器的根目录应为 static/；
+# Streamlit 自身的 app/static/export/ 路径同样可用。
+#
+# 用法：python build_static.py [--check]
+# =============================
+EXPORT_DIR = os.path.join(STATIC_ROOT, "export")
+FIGURE_DIR = os.path.join(EXPORT_DIR, "figures")
+MANIFEST_PATH = os.path.join(EXPORT_DIR, "manifest.json")
+PLOTLY_JS = "plotly.min.js"
+RENDERER_SOURCES = ("timeline.py", "event_index.py")
+PAGES = (("system1.html", "系统 1：Vis-Rate 暴力程度时间轴分析"),
+         ("system2.html", "系统 2：ESRB 游戏年龄评级"),
+         ("system3.html", "系统 3：Common Sense Media 暴力内容总结"))
+
+def figure_filename(prefix):
+    return f"{prefix}_timeline.json"
+
+@functools.lru_cache(maxsize=1)
+def renderer_version():
+    # 绘图代码（timeline.py、决定区间合并与聚合结果的 event_index.py、systems.render_timeline）和
+    # Plotly 版本的哈希，任一改动后旧 JSON 自动失效
+    import plotly
+    h = hashlib.sha256()
+    for name in RENDERER_SOURCES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), "rb") as f:
+            h.update(f.read())
+    h.update(inspect.getsource(systems.render_timeline).encode("utf-8"))
+    h.update(plotly.__version__.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+_manifest_cache = {"mtime": None, "data": None}
+
+def _load_manifest():
+    # 按修改时间缓存，重新构建后自动读到新的 manifest
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        return None
+    if _manifest_cache["mtime"] != mtime:
+        try:
+            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+                _manifest_cache["data"] = json.load(f)
+        except (OSError, ValueError):
+            _manifest_cache["data"] = None
+        _manifest_cache["mtime"] = mtime
+    return _manifest_cache["data"]
+
+def load_prebuilt_figure(game_name, data_version):
+    # 返回预构建的图表；没有构建过、数据或绘图代码已变化时返回 None，由调用方现场绘制
+    manifest = _load_manifest()
+    if not manifest or manifest.get("data_version") != data_version or manifest.get("renderer") != renderer_version():
+        return None
+    entry = manifest.get("games", {}).get(game_name)
+    if entry is None:
+        return None
+    import plotly.io as pio
+    try:
+        with open(os.path.join(EXPORT_DIR, entry["figure"]), "r", encoding="utf-8") as f:
+            return pio.from_json(f.read())
+    except (OSError, ValueError):
+        return None
+
+def _write(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _export_url(asset):
+    # 页面位于 static/export/，把 app/static/ 开头的 URL 换成相对路径
+    return asset.url.replace("app/static/", "../", 1)
+
+def _page(title, current, body, head=""):
+    nav = " · ".join(
+        f"<strong>{html.escape(label)}</strong>" if name == current else f'<a href="{name}">{html.escape(label)}</a>'
+        for name, label in (("index.html", "主页"), *PAGES)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(title)}</title>
+<style>
+body {{ font-family: "Source Sans Pro", "PingFang SC", "Microsoft YaHei", sans-serif; max-width: 1400px; margin: 0 auto; padding: 24px 48px; color: #31333F; }}
+nav {{ margin-bottom: 24px; font-size: 15px; }}
+select {{ font-size: 16px; padding: 6px 10px; margin-bottom: 16px; }}
+.vr-game {{ display: none; }}
+.vr-game.active {{ display: block; }}
+</style>
+{head}
+</head>
+<body>
+<nav>{nav}</nav>
+{body}
+</body>
+</html>
+"""
+
+def _game_select(games):
+    options = "".join(f'<option value="{html.escape(cfg["prefix"])}">{html.escape(name)}</option>' for name, cfg in games)
+    return f'<label>选择游戏<br><select id="vr-select">{options}</select></label>'
+
+# 切换下拉框时只显示对应游戏的区块；地址栏 #prefix 可直接定位到某个游戏
+_SELECT_JS = """
+<script>
+(function () {
+  var select = document.getElementById("vr-select");
+  function show(prefix) {
+    document.querySelectorAll(".vr-game").forEach(function (el) {
+      el.classList.toggle("active", el.dataset.prefix === prefix);
+    });
+    if (window.vrOnGame) window.vrOnGame(prefix);
+  }
+  var initial = decodeURIComponent(location.hash.slice(1));
+  if (initial && select.querySelector('option[value="' + initial + '"]')) select.value = initial;
+  select.addEventListener("change", function () { history.replaceState(null, "", "#" + select.value); show(select.value); });
+  show(select.value);
+})();
+</script>
+"""
+
+# 系统一：按需加载图表 JSON 绘图，悬停方块显示预览图，点击方块后切换片段（与实时页面一样，customdata[0] 为事件 ID，-1 为占位）
+_SYSTEM1_JS = """
+<script>
+""" + HOVER_PREVIEW_JS + """
+window.vrOnGame = function (prefix) {
+  var el = document.getElementById("vr-chart-" + prefix);
+  if (el.dataset.loaded) return;
+  el.dataset.loaded = "1";
+  fetch(el.dataset.figure).then(function (r) { return r.json(); }).then(function (fig) {
+    Plotly.newPlot(el, fig.data, fig.layout, {responsive: true, displaylogo: false});
+    var preview = JSON.parse(document.getElementById("vr-preview-" + prefix).textContent);
+    if (preview) vrAttachHoverPreview(el, function () { return preview; });
+    el.on("plotly_click", function (ev) {
+      var point = ev.points && ev.points[0];
+      if (!point || !point.customdata) return;
+      var id = parseInt(point.customdata[0], 10);
+      var clips = JSON.parse(document.getElementById("vr-clips-" + prefix).textContent);
+      var box = document.getElementById("vr-video-" + prefix);
+      if (id === -1 || isNaN(id)) return;
+      if (!clips[id]) { box.innerHTML = "<p style='color:#c0392b'>找不到该事件的视频文件</p>"; return; }
+      box.innerHTML = '<video src="' + clips[id] + '" autoplay loop muted playsinline controls style="width:100%; border-radius:8px;"></video>';
+    });
+  });
+};
+</script>
+"""
+
+def build_system1(games, manifest):
+    sections = []
+    for name, cfg in games:
+        prefix = cfg["prefix"]
+        index = systems.load_index(name, GAMES_DATA.version)
+        df = systems.load_events(name, GAMES_DATA.version)
+        clips = {}
+        for evt_id in range(len(index)):
+            clip = manifest.clip(prefix, evt_id)
+            if clip is not None:
+                clips[evt_id] = _export_url(clip.for_width(CLIP_DISPLAY_WIDTH))
+        sprite = manifest.sprite(prefix)
+        preview = hover_preview_config(_export_url(sprite), len(index), df["keywords"].tolist()) if sprite is not None else None
+        # JSON 放在 <script type="application/json"> 中，注意转义 </ 以免提前结束标签
+        clips_json = json.dumps(clips, ensure_ascii=False).replace("</", "<\\/")
+        preview_json = json.dumps(preview, ensure_ascii=False).replace("</", "<\\/")
+        sections.append(f"""
+<section class="vr-game" data-prefix="{html.escape(prefix)}">
+  <h3>📄 游戏内容总结</h3>
+  {systems.summary1_html(cfg)}
+  <h3>📊 暴力程度时间轴</h3>
+  <div id="vr-chart-{html.escape(prefix)}" data-figure="figures/{figure_filename(prefix)}" style="height:240px;"></div>
+  <h3>🎬 事件动态预览</h3>
+  <div id="vr-video-{html.escape(prefix)}" style="width:50%; margin:0 auto;"><p style="color:#808495;">点击时间轴上的方块查看 3s 事件视频</p></div>
+  <script type="application/json" id="vr-clips-{html.escape(prefix)}">{clips_json}</script>
+  <script type="application/json" id="vr-preview-{html.escape(prefix)}">{preview_json}</script>
+</section>""")
+    body = f"<h2>📊 系统一：Vis-Rate 暴力程度时间轴分析</h2>\n{_game_select(games)}\n{''.join(sections)}\n{_SYSTEM1_JS}{_SELECT_JS}"
+    return _page(PAGES[0][1], PAGES[0][0], body, head=f'<script src="{PLOTLY_JS}"></script>')
+
+def build_system2(games, manifest):
+    sections = []
+    for name, cfg in games:
+        prefix = cfg["prefix"]
+        variants = manifest.cover_variants(prefix)
+        cover = manifest.cover(prefix)
+        if variants:
+            image = picture_html(variants, alt=name, caption=f"{name} 评级参考图").replace("app/static/", "../")
+        elif cover is not None:
+            image = f'<img src="{_export_url(cover)}" alt="{html.escape(name)}" width="{COVER_DISPLAY_WIDTH}" style="max-width:100%;">'
+        else:
+            image = "<p>图片未找到</p>"
+        sections.append(f"""
+<section class="vr-game" data-prefix="{html.escape(prefix)}">
+  <h3>📋 评级详情</h3>
+  {systems.esrb_html(cfg)}
+  <h3>🖼️ 游戏封面图</h3>
+  {image}
+</section>""")
+    body = f"<h2>🖼️ 系统二：ESRB 游戏年龄评级</h2>\n{_game_select(games)}\n{''.join(sections)}\n{_SELECT_JS}"
+    return _page(PAGES[1][1], PAGES[1][0], body)
+
+def build_system3(games, manifest):
+    sections = []
+    for name, cfg in games:
+        prefix = cfg["prefix"]
+        demo = manifest.demo(prefix)
+        # 只有当前显示的游戏才开始加载演示视频（preload="none"，切换时由脚本播放）
+        video = (f'<video src="{_export_url(demo.for_width(DEMO_DISPLAY_WIDTH))}" loop muted playsinline controls preload="none" style="width:100%;"></video>'
+                 if demo is not None else "<p>视频演示文件未找到</p>")
+        sections.append(f"""
+<section class="vr-game" data-prefix="{html.escape(prefix)}">
+  {systems.violence_score_html(cfg)}
+  {systems.summary3_html(cfg)}
+  <hr>
+  <h3>📽️ 暴力内容典型片段演示</h3>
+  {video}
+</section>""")
+    autoplay = """
+<script>
+window.vrOnGame = function (prefix) {
+  document.querySelectorAll(".vr-game video").forEach(function (v) { v.pause(); });
+  var v = document.querySelector('.vr-game[data-prefix="' + prefix + '"] video');
+  if (v) v.play();
+};
+</script>
+"""
+    body = f"<h2>🎥 系统三：Common Sense Media 暴力内容总结</h2>\n{_game_select(games)}\n{''.join(sections)}\n{autoplay}{_SELECT_JS}"
+    return _page(PAGES[2][1], PAGES[2][0], body)
+
+def build_index():
+    links = "".join(f'<p><a href="{name}" style="font-size:20px;">{html.escape(label)}</a></p>' for name, label in PAGES)
+    body = f"""<h1 style="text-align:center;">欢迎您参加关于“电子游戏评级信息呈现方式”的学术研究项目</h1>
+<hr>
+<div style="max-width:700px; margin:0 auto;"><h3>请选择下方其中一个系统进行体验：</h3>{links}</div>"""
+    return _page("电子游戏评级信息研究平台", "index.html", body)
+
+def build(out=sys.stdout):
+    start = time.perf_counter()
+    os.makedirs(FIGURE_DIR, exist_ok=True)
+    data_version = GAMES_DATA.version
+    games = [(name, GAMES_DATA[name]) for name in GAMES_DATA]
+    manifest = AssetManifest(GAMES_DATA)
+
+    # 1. 图表 JSON：与实时页面调用同一个绘图函数（整段时间轴，不缩放）
+    entries = {}
+    for name, cfg in games:
+        df = systems.load_events(name, data_version)
+        fig = systems.render_timeline(name, df, systems.load_index(name, data_version))
+        filename = figure_filename(cfg["prefix"])
+        _write(os.path.join(FIGURE_DIR, filename), fig.to_json())
+        entries[name] = {"prefix": cfg["prefix"], "figure": f"figures/{filename}"}
+        print(f"{name}: {len(df)} 个事件 -> figures/{filename}", file=out)
+
+    # 2. 页面与 Plotly.js（随 plotly 包一起分发，离线可用）
+    from plotly.offline import get_plotlyjs
+    _write(os.path.join(EXPORT_DIR, PLOTLY_JS), get_plotlyjs())
+    _write(os.path.join(EXPORT_DIR, "index.html"), build_index())
+    for (filename, _), builder in zip(PAGES, (build_system1, build_system2, build_system3)):
+        _write(os.path.join(EXPORT_DIR, filename), builder(games, manifest))
+
+    # 3. manifest 最后写入：实时应用以它为准，写完之前仍使用旧的（或现场绘制）
+    for name in os.listdir(FIGURE_DIR):
+        if name.endswith(".json") and name not in {os.path.basename(e["figure"]) for e in entries.values()}:
+            os.remove(os.path.join(FIGURE_DIR, name))
+    _write(MANIFEST_PATH, json.dumps({
+        "data_version": data_version,
+        "renderer": renderer_version(),
+        "built_at": time.time(),
+        "games": entries,
+    }, ensure_ascii=False, indent=2))
+    print(f"已导出 {len(games)} 个游戏到 {EXPORT_DIR}/，用时 {time.perf_counter() - start:.1f}s", file=out)
+
+def is_fresh():
+    manifest = _load_manifest()
+    return bool(manifest) and manifest.get("data_version") == GAMES_DATA.version and manifest.get("renderer") == renderer_version()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把时间轴图表和三个系统的页面导出为静态文件")
+    parser.add_argument("--check", action="store_true", help="只检查已导出的内容是否与当前数据和绘图代码一致，过期时返回 1")
+    args = parser.parse_args()
+    if args.check:
+        fresh = is_fresh()
+        print("静态导出是最新的" if fresh else "静态导出不存在或已过期，请运行 python build_static.py")
+        sys.exit(0 if fresh else 1)
+    build()
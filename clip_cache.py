@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# =============================
+# 片段预取缓存：进程内所有会话共享一个按字节数限额的 LRU，存放事件片段的文件内容。
+# 选中游戏后由后台线程按时间轴顺序把该游戏的片段读入内存，点击事件时 st.video 直接使用内存中的字节，
+# 不再在 rerun 中同步读盘。键为 (路径, 修改时间)，文件更新后旧内容自然被挤出。
+# 容量由环境变量 VISRATE_CLIP_CACHE_MB 配置，默认 256 MB
+# =============================
+DEFAULT_MAX_MB = 256
+MAX_BYTES = int(float(os.environ.get("VISRATE_CLIP_CACHE_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+class ClipCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()      # (路径, 修改时间) -> bytes，最近使用的在末尾
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetched = 0
+        self._pending = []
+        self._generation = 0
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def get(self, asset):
+        # asset: AssetInfo。未命中时同步读盘并放入缓存
+        key = (asset.path, asset.mtime)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.count_lookup("clip_cache", data is not None)
+        if data is None:
+            data = _read(asset.path)
+            self._put(key, data)
+        return data
+
+    def peek(self, asset):
+        # 只查看，不读盘、不计入命中率、不改变淘汰顺序
+        with self._lock:
+            return self._entries.get((asset.path, asset.mtime))
+
+    def _put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = data
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self.bytes -= len(old)
+                self.evictions += 1
+
+    def prefetch(self, assets):
+        # 按给定顺序在后台预读；新的请求替换尚未处理的旧请求（用户已经换了游戏）。
+        # 一批预读的总量不超过容量，避免后面的片段把同一批前面的片段挤出去
+        with self._lock:
+            self._pending = [a for a in assets if a is not None]
+            self._generation += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="clip-prefetch", daemon=True)
+                self._worker.start()
+        self._wakeup.set()
+
+    def _run(self):
+        generation, budget = None, 0
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        break
+                    if generation != self._generation:
+                        generation, budget = self._generation, self.max_bytes
+                    asset = self._pending.pop(0)
+                    cached = (asset.path, asset.mtime) in self._entries
+                budget -= asset.size
+                if budget < 0:
+                    with self._lock:
+                        if generation == self._generation:
+                            self._pending = []
+                    continue
+                if cached:
+                    continue
+                try:
+                    data = _read(asset.path)
+                except OSError as e:
+                    print(f"片段预读失败: {asset.path}: {e}", file=sys.stderr)
+                    continue
+                self._put((asset.path, asset.mtime), data)
+                with self._lock:
+                    self.prefetched += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "prefetched": self.prefetched,
+                "pending": len(self._pending),
+            }
@@ -1,27 +1,262 @@
 import os
-from moviepy.editor import VideoFileClip
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def convert_gifs_to_mp4(source_dir, target_dir):
+from assets import RENDITIONS, rendition_filename, is_rendition_filename
+from ffmpeg_utils import run_ffmpeg, probe_video, file_sha256
+
+# 编码参数会写入 manifest，参数变化后所有文件都会重新转换。
+# 每个 GIF 输出一组码率阶梯（见 assets.RENDITIONS），全部把 moov 放到文件头（faststart），
+# 浏览器拿到开头几 KB 就能开始播放
+ENCODER_SETTINGS = {"codec": "libx264", "preset": "medium", "faststart": True, "renditions": RENDITIONS}
+MANIFEST_NAME = ".convert_manifest.json"
+
+def load_manifest(target_dir):
+    path = os.path.join(target_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(target_dir, manifest):
+    path = os.path.join(target_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def has_faststart(path):
+    # 顺序读取顶层 box 头：moov 出现在 mdat 之前即为 faststart
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            size = int.from_bytes(header[:4], "big")
+            box = header[4:8]
+            if box == b"moov":
+                return True
+            if box == b"mdat":
+                return False
+            if size == 1:
+                size = int.from_bytes(f.read(8), "big")
+                f.seek(size - 16, os.SEEK_CUR)
+            elif size == 0:
+                return False
+            else:
+                f.seek(size - 8, os.SEEK_CUR)
+
+def ladder_for(source_height, settings):
+    # 只保留比源分辨率低的档位，再加上源分辨率这一档
+    return [r for r in settings["renditions"] if r["height"] is None or (source_height and r["height"] < source_height)]
+
+def _encode_args(rendition, settings):
+    args = ["-c:v", settings["codec"], "-preset", settings["preset"], "-crf", str(rendition["crf"]), "-pix_fmt", "yuv420p", "-an"]
+    if rendition.get("maxrate"):
+        args += ["-maxrate", rendition["maxrate"], "-bufsize", rendition["bufsize"]]
+    if settings["faststart"]:
+        args += ["-movflags", "+faststart"]
+    return args
+
+def encode_ladder(input_path, base_mp4_path, settings, skip_source=False):
+    # 解码一次，用 split 滤镜同时输出各档位；返回输出文件名列表
+    height = probe_video(input_path)["height"]
+    ladder = [r for r in ladder_for(height, settings) if not (skip_source and r["height"] is None)]
+    if not ladder:
+        return []
+    labels = [f"v{i}" for i in range(len(ladder))]
+    graph = f"[0:v]split={len(ladder)}" + "".join(f"[s{i}]" for i in range(len(ladder))) + ";"
+    for i, r in enumerate(ladder):
+        # 宽高必须为偶数，libx264 + yuv420p 才能编码
+        scale = f"scale=-2:{r['height']}" if r["height"] else "scale=trunc(iw/2)*2:trunc(ih/2)*2"
+        graph += f"[s{i}]{scale}[{labels[i]}];"
+    args = ["-i", input_path, "-filter_complex", graph.rstrip(";")]
+    outputs = []
+    for label, r in zip(labels, ladder):
+        out_path = os.path.join(os.path.dirname(base_mp4_path), rendition_filename(os.path.basename(base_mp4_path), r["name"]))
+        args += ["-map", f"[{label}]", *_encode_args(r, settings), out_path]
+        outputs.append(os.path.basename(out_path))
+    run_ffmpeg(args, outputs=[os.path.join(os.path.dirname(base_mp4_path), name) for name in outputs])
+    # 各档位同时写出、完成时间略有先后，统一修改时间，避免下次被误判为过期
+    now = time.time()
+    for name in outputs:
+        os.utime(os.path.join(os.path.dirname(base_mp4_path), name), (now, now))
+    return outputs
+
+def convert_one(gif_path, mp4_path, settings):
+    # 在子进程中执行，返回 (是否成功, 耗时, 错误信息, 输出文件名列表)
+    start = time.perf_counter()
+    try:
+        outputs = encode_ladder(gif_path, mp4_path, settings)
+        return True, time.perf_counter() - start, None, outputs
+    except Exception as e:
+        return False, time.perf_counter() - start, str(e), []
+
+def plan_conversions(source_dir, target_dir, manifest, force=False):
+    # 对比 manifest，返回 (待转换列表, 孤儿输出列表)；未变化的条目会就地刷新 mtime
+    todo = []
+    sources = set()
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith(".gif"):
+            continue
+        sources.add(filename)
+        gif_path = os.path.join(source_dir, filename)
+        mp4_name = filename[:-len(".gif")] + ".mp4"
+        mp4_path = os.path.join(target_dir, mp4_name)
+        mtime = os.path.getmtime(gif_path)
+        entry = manifest.get(filename)
+
+        if force or entry is None or entry.get("settings") != ENCODER_SETTINGS or not all(os.path.exists(os.path.join(target_dir, o)) for o in entry["outputs"]):
+            todo.append((filename, gif_path, mp4_path))
+            continue
+
+        if entry["mtime"] != mtime:
+            # mtime 变化时才计算哈希，内容未变只更新 mtime
+            digest = file_sha256(gif_path)
+            if digest != entry["sha256"]:
+                todo.append((filename, gif_path, mp4_path))
+            else:
+                entry["mtime"] = mtime
+
+    orphans = [name for name in manifest if name not in sources]
+    return todo, orphans
+
+def _run_jobs(func, jobs, workers, on_result):
+    # jobs: [(key, args)]；workers=1 时在当前进程串行执行
+    if workers == 1:
+        for key, args in jobs:
+            print(f"正在处理: {key}...")
+            on_result(key, func(*args))
+        return
+    print(f"使用 {workers} 个进程处理 {len(jobs)} 个文件...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(func, *args): key for key, args in jobs}
+        for future in as_completed(futures):
+            on_result(futures[future], future.result())
+
+def convert_gifs_to_mp4(source_dir, target_dir, workers=None, force=False):
     if not os.path.exists(target_dir):
         os.makedirs(target_dir)
 
-    for filename in os.listdir(source_dir):
-        if filename.endswith(".gif"):
-            gif_path = os.path.join(source_dir, filename)
-            mp4_path = os.path.join(target_dir, filename.replace(".gif", ".mp4"))
-            
-            print(f"正在转换: {filename}...")
-            try:
-                clip = VideoFileClip(gif_path)
-                # 使用 libx264 编码，保证网页兼容性
-                clip.write_videofile(mp4_path, codec="libx264", audio=False)
-                clip.close()
-            except Exception as e:
-                print(f"转换 {filename} 失败: {e}")
+    manifest = load_manifest(target_dir)
+    todo, orphans = plan_conversions(source_dir, target_dir, manifest, force=force)
+
+    # 源 GIF 已删除的输出一并清理（只清理 manifest 中登记过的文件）
+    for name in orphans:
+        for output in manifest[name]["outputs"]:
+            output = os.path.join(target_dir, output)
+            if os.path.exists(output):
+                os.remove(output)
+                print(f"已删除孤儿文件: {output}")
+        del manifest[name]
+
+    if not todo:
+        save_manifest(target_dir, manifest)
+        print("没有需要转换的文件。")
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    results = []
+    total_start = time.perf_counter()
+    paths = {filename: (gif_path, mp4_path) for filename, gif_path, mp4_path in todo}
+
+    def record(filename, result):
+        ok, seconds, error, outputs = result
+        gif_path, _ = paths[filename]
+        results.append((filename, ok, seconds, error))
+        if ok:
+            manifest[filename] = {
+                "sha256": file_sha256(gif_path),
+                "mtime": os.path.getmtime(gif_path),
+                "settings": ENCODER_SETTINGS,
+                "outputs": outputs,
+            }
+            print(f"转换完成: {filename} -> {', '.join(outputs)} ({seconds:.1f}s)")
+        else:
+            print(f"转换 {filename} 失败: {error}")
+
+    _run_jobs(convert_one, [(f, (g, m, ENCODER_SETTINGS)) for f, g, m in todo], workers, record)
+
+    save_manifest(target_dir, manifest)
+    print_summary(results, time.perf_counter() - total_start)
+    return results
+
+def ladder_one(mp4_path, settings):
+    # 为已有的 MP4（演示视频、切出的片段）补齐低分辨率档位，并把源文件重新封装为 faststart
+    start = time.perf_counter()
+    try:
+        outputs = []
+        # 先无损重新封装源文件，再生成档位，保证档位的修改时间不早于源文件
+        if settings["faststart"] and not has_faststart(mp4_path):
+            run_ffmpeg(["-i", mp4_path, "-map", "0", "-c", "copy", "-movflags", "+faststart", mp4_path], outputs=[mp4_path])
+            outputs.append(os.path.basename(mp4_path))
+        outputs += encode_ladder(mp4_path, mp4_path, settings, skip_source=True)
+        return True, time.perf_counter() - start, None, outputs
+    except Exception as e:
+        return False, time.perf_counter() - start, str(e), []
+
+def build_ladders(mp4_dirs, workers=None, force=False):
+    # 只处理缺少档位、档位比源文件旧或尚未 faststart 的 MP4
+    jobs = []
+    for directory in mp4_dirs:
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".mp4") or filename.startswith(".") or is_rendition_filename(filename):
+                continue
+            path = os.path.join(directory, filename)
+            mtime = os.path.getmtime(path)
+            expected = [
+                os.path.join(directory, rendition_filename(filename, r["name"]))
+                for r in ladder_for(probe_video(path)["height"], ENCODER_SETTINGS) if r["height"]
+            ]
+            stale = any(not os.path.exists(p) or os.path.getmtime(p) < mtime for p in expected)
+            if force or stale or (ENCODER_SETTINGS["faststart"] and not has_faststart(path)):
+                jobs.append((path, (path, ENCODER_SETTINGS)))
+
+    if not jobs:
+        print("所有 MP4 的码率阶梯都是最新的。")
+        return []
+    results = []
+    total_start = time.perf_counter()
+
+    def record(path, result):
+        ok, seconds, error, outputs = result
+        results.append((path, ok, seconds, error))
+        print(f"{path}: {', '.join(outputs) or '无需更新'} ({seconds:.1f}s)" if ok else f"{path} 失败: {error}")
+
+    _run_jobs(ladder_one, jobs, workers or os.cpu_count() or 1, record)
+    print_summary(results, time.perf_counter() - total_start)
+    return results
+
+def print_summary(results, wall_seconds):
+    print("\n===== 转换耗时汇总 =====")
+    for filename, ok, seconds, _ in sorted(results, key=lambda r: -r[2]):
+        status = "成功" if ok else "失败"
+        print(f"{filename:<40} {status}  {seconds:6.1f}s")
+    cpu_seconds = sum(r[2] for r in results)
+    failed = sum(1 for r in results if not r[1])
+    print(f"共 {len(results)} 个文件，失败 {failed} 个，累计编码 {cpu_seconds:.1f}s，实际用时 {wall_seconds:.1f}s")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将 GIF 增量、并行地转换为多档位 MP4")
     # 根据你的项目结构调整路径
-    source = os.path.join("static", "gif_cache")
-    target = os.path.join("static", "video_cache")
-    convert_gifs_to_mp4(source, target)
-    print("转换完成！")
\ No newline at end of file
+    parser.add_argument("--source", default=os.path.join("static", "gif_cache"))
+    parser.add_argument("--target", default=os.path.join("static", "video_cache"))
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认等于 CPU 核数；1 表示串行")
+    parser.add_argument("--force", action="store_true", help="忽略 manifest，全部重新转换")
+    parser.add_argument(
+        "--ladder", action="append", metavar="DIR",
+        help="为目录中已有的 MP4 补齐码率阶梯并 faststart，可重复，如 --ladder static/videos --ladder static/video_cache",
+    )
+    args = parser.parse_args()
+
+    if args.ladder:
+        results = build_ladders(args.ladder, workers=args.workers, force=args.force)
+    else:
+        results = convert_gifs_to_mp4(args.source, args.target, workers=args.workers, force=args.force)
+    print("转换完成！")
+    sys.exit(1 if any(not ok for _, ok, _, _ in results) else 0)
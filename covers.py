@@ -0,0 +1,140 @@
+import os
+import json
+import html
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import COVER_DIR, COVER_VARIANT_DIR, COVER_VARIANT_INDEX, cover_filename, cover_variant_filename
+from ffmpeg_utils import file_sha256
+
+# =============================
+# 封面图变体：按系统二实际显示的宽度（及其 2 倍，用于高分屏）预先缩放，
+# 输出 AVIF / WebP 以及 PNG 兜底。文件名带源文件哈希，源图不变时不会重复生成；
+# 页面用 <picture> 引用静态 URL，由浏览器挑选支持的格式和合适的尺寸
+# =============================
+COVER_DISPLAY_WIDTH = 600
+COVER_WIDTHS = (COVER_DISPLAY_WIDTH, COVER_DISPLAY_WIDTH * 2)
+# (格式, 扩展名, MIME, 保存参数)，按优先级排列；PNG 必须保留，作为不支持新格式时的兜底
+FORMATS = (
+    ("AVIF", "avif", "image/avif", {"quality": 55, "speed": 6}),
+    ("WEBP", "webp", "image/webp", {"quality": 80, "method": 6}),
+    ("PNG", "png", "image/png", {"optimize": True}),
+)
+
+def load_index():
+    if not os.path.exists(COVER_VARIANT_INDEX):
+        return {}
+    with open(COVER_VARIANT_INDEX, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_index(index):
+    tmp_path = COVER_VARIANT_INDEX + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, COVER_VARIANT_INDEX)
+
+def _available_formats():
+    # AVIF 编码需要较新的 Pillow（或 pillow-avif-plugin），不可用时跳过
+    from PIL import features
+    return [f for f in FORMATS if f[0] != "AVIF" or features.check("avif")]
+
+def generate_cover_variants(prefix, entry=None, force=False):
+    # 返回新的索引条目；源图缺失返回 None
+    src = os.path.join(COVER_DIR, cover_filename(prefix))
+    if not os.path.exists(src):
+        return None
+    # 索引只记录内容哈希，不记录修改时间：索引和变体随仓库提交，修改时间在每份检出里都不同
+    digest = file_sha256(src)
+    formats = _available_formats()
+    if entry and not force and entry["sha256"] == digest \
+            and {v["format"] for v in entry["variants"]} == {f[1] for f in formats} \
+            and all(os.path.exists(os.path.join(COVER_VARIANT_DIR, v["file"])) for v in entry["variants"]):
+        return entry
+
+    from PIL import Image
+
+    variants = []
+    with Image.open(src) as img:
+        img.load()
+        # 不放大：比源图宽的档位合并为源图宽度
+        widths = sorted({min(w, img.width) for w in COVER_WIDTHS})
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        base = img.convert("RGBA" if has_alpha else "RGB")
+        for width in widths:
+            height = round(img.height * width / img.width)
+            resized = base if width == img.width else base.resize((width, height), Image.LANCZOS)
+            for fmt, ext, _, params in formats:
+                name = cover_variant_filename(prefix, digest, width, ext)
+                path = os.path.join(COVER_VARIANT_DIR, name)
+                if force or not os.path.exists(path):
+                    tmp_path = f"{path}.tmp"
+                    resized.save(tmp_path, fmt, **params)
+                    os.replace(tmp_path, path)
+                variants.append({"file": name, "width": width, "height": height, "format": ext})
+
+    # 清理同一游戏旧哈希的变体
+    keep = {v["file"] for v in variants}
+    for name in os.listdir(COVER_VARIANT_DIR):
+        if name.startswith(f"{prefix}_cover_") and name not in keep:
+            os.remove(os.path.join(COVER_VARIANT_DIR, name))
+    return {"sha256": digest, "size": os.path.getsize(src), "variants": variants}
+
+def generate_all(games, workers=None, force=False):
+    os.makedirs(COVER_VARIANT_DIR, exist_ok=True)
+    index = load_index()
+    prefixes = [cfg["prefix"] for cfg in games.values()]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = [(p, pool.submit(generate_cover_variants, p, index.get(p), force)) for p in prefixes]
+        for prefix, future in futures:
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"{prefix}: 封面变体生成失败: {e}")
+                continue
+            if entry is None:
+                print(f"{prefix}: 缺少封面原图，跳过")
+                index.pop(prefix, None)
+                continue
+            index[prefix] = entry
+            src_size = entry["size"]
+            smallest = min(os.path.getsize(os.path.join(COVER_VARIANT_DIR, v["file"])) for v in entry["variants"])
+            print(f"{prefix}: {len(entry['variants'])} 个变体，原图 {src_size / 1024:.0f} KB，最小 {smallest / 1024:.0f} KB")
+    for prefix in [p for p in index if p not in prefixes]:
+        del index[prefix]
+    save_index(index)
+
+def picture_html(variants, alt, caption=None, display_width=COVER_DISPLAY_WIDTH):
+    # variants: AssetInfo 列表（width 已填）。每种格式一个 <source>，用 srcset + sizes 让浏览器按
+    # 显示宽度和设备像素比挑选；最后的 <img> 使用 PNG，兼容不支持新格式的浏览器
+    by_format = {}
+    for v in variants:
+        by_format.setdefault(os.path.splitext(v.path)[1][1:], []).append(v)
+    sources = []
+    for _, ext, mime, _ in FORMATS:
+        if ext == "png" or ext not in by_format:
+            continue
+        srcset = ", ".join(f"{v.url} {v.width}w" for v in sorted(by_format[ext], key=lambda v: v.width))
+        sources.append(f'<source type="{mime}" srcset="{srcset}" sizes="{display_width}px">')
+    pngs = sorted(by_format.get("png", []), key=lambda v: v.width)
+    fallback = next((v for v in pngs if v.width >= display_width), pngs[-1])
+    srcset = ", ".join(f"{v.url} {v.width}w" for v in pngs)
+    height = round(fallback.height * display_width / fallback.width)
+    caption_html = f'<figcaption style="color:#808495; font-size:14px; text-align:center;">{html.escape(caption)}</figcaption>' if caption else ""
+    return f"""
+    <figure style="margin:0; width:{display_width}px; max-width:100%;">
+        <picture>{''.join(sources)}
+            <img src="{fallback.url}" srcset="{srcset}" sizes="{display_width}px" width="{display_width}" height="{height}"
+                 alt="{html.escape(alt)}" decoding="async" style="width:100%; height:auto; border-radius:4px;">
+        </picture>
+        {caption_html}
+    </figure>
+    """
+
+if __name__ == "__main__":
+    from game_store import GAMES
+
+    parser = argparse.ArgumentParser(description="为封面图生成按显示宽度缩放的 AVIF/WebP/PNG 变体")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="全部重新生成")
+    args = parser.parse_args()
+    generate_all(GAMES, workers=args.workers, force=args.force)
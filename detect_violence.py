@@ -0,0 +1,214 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from event_index import merge_intervals
+from extract_clips import CLIP_SECONDS, find_source_video
+from ffmpeg_utils import get_ffmpeg_exe, probe_video
+
+# =============================
+# 暴力片段自动检测：把整段录像按分钟切块，每块由一个子进程让 ffmpeg 以低帧率、低分辨率解码成
+# rgb24 原始帧流，逐帧用 NumPy 计算三个廉价特征——血红色像素占比、运动能量（相邻帧灰度差）、
+# 镜头切换分数（相邻帧颜色直方图差）。汇总为每秒分数后找出高分区间，输出与 raw_events
+# 相同格式的候选事件（含建议等级和 gif_timestamp），供人工复核后再合并进 data/games.json
+# =============================
+ANALYSIS_FPS = 4
+ANALYSIS_WIDTH = 160
+CHUNK_SECONDS = 60
+HIST_BINS = 16
+# 特征权重：血色最能说明暴力程度，运动和剪辑节奏用于区分战斗与静态画面
+WEIGHTS = {"red": 0.5, "motion": 0.3, "cut": 0.2}
+# 每秒分数（以全片第 95 百分位为 1.0 归一化后加权）超过 THRESHOLD 的秒数构成候选区间
+THRESHOLD = 0.6
+# 单个特征饱和（达到全片第 95 百分位）时的保底分数，不依赖其他特征也能越过 THRESHOLD。
+# 只对血色生效：纯血色、几乎静止的画面运动和剪辑分数都为 0，加权后最高只有 WEIGHTS["red"]，
+# 永远达不到阈值；运动和剪辑单独出现只说明画面激烈，仍需与血色叠加才算候选
+SATURATED_SCORE = {"red": 0.8}
+SMOOTH_SECONDS = 3
+MERGE_GAP = 3
+MIN_SEGMENT_SECONDS = 2
+# 区间峰值分数达到这些阈值分别建议为 1/2/3 级
+LEVEL_THRESHOLDS = (THRESHOLD, 1.0, 1.6)
+CUT_THRESHOLD = 0.5
+# 归一化尺度的下限：某个特征在全片绝大部分时间为 0 时（例如血色只出现在不到 5% 的时间里），
+# 第 95 百分位也是 0，用下限代替，避免一点点噪声就被放大成高分
+NORM_FLOOR = {"red": 0.05, "motion": 0.03, "cut": 2.0}
+
+def _fmt_time(sec):
+    # 与 data/games.json 一致：一小时以内用 MM:SS，否则 HH:MM:SS
+    sec = int(sec)
+    if sec < 3600:
+        return f"{sec // 60:02d}:{sec % 60:02d}"
+    return f"{sec // 3600:02d}:{sec // 60 % 60:02d}:{sec % 60:02d}"
+
+def frame_features(frame, prev):
+    # frame: (h, w, 3) uint8；返回 (血红占比, 运动能量, 镜头切换分数)，都在 0~1 之间
+    rgb = frame.astype(np.int16)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    red = np.mean((r > 90) & (r > g * 1.8) & (r > b * 1.6))
+    if prev is None:
+        return red, 0.0, 0.0
+    gray = rgb.mean(axis=2)
+    prev_rgb = prev.astype(np.int16)
+    motion = np.mean(np.abs(gray - prev_rgb.mean(axis=2))) / 255
+    # 每个通道 16 个分箱的归一化直方图，L1 距离的一半即两帧颜色分布不重合的比例
+    hist = np.concatenate([np.bincount(frame[..., c].ravel() >> 4, minlength=HIST_BINS) for c in range(3)])
+    prev_hist = np.concatenate([np.bincount(prev[..., c].ravel() >> 4, minlength=HIST_BINS) for c in range(3)])
+    cut = np.abs(hist - prev_hist).sum() / (2 * 3 * frame.shape[0] * frame.shape[1])
+    return red, motion, cut
+
+def analyze_chunk(source_path, start, duration, width, height, fps=ANALYSIS_FPS):
+    # 在子进程中执行：从 start 前一帧开始解码（用于计算首帧的差分），逐帧读取管道，不把整块读进内存。
+    # 返回 (时间戳数组, 特征数组 (n, 3))
+    lead = 1 / fps if start > 0 else 0
+    cmd = [
+        get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error",
+        "-ss", f"{start - lead:.3f}", "-t", f"{duration + lead:.3f}", "-i", source_path,
+        "-an", "-vf", f"fps={fps},scale={width}:{height}", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1",
+    ]
+    frame_size = width * height * 3
+    times, feats = [], []
+    prev = None
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=frame_size * 8) as proc:
+        i = 0
+        while True:
+            buf = proc.stdout.read(frame_size)
+            if len(buf) < frame_size:
+                break
+            frame = np.frombuffer(buf, dtype=np.uint8).reshape(height, width, 3)
+            t = start - lead + i / fps
+            if t >= start - 1e-6:
+                times.append(t)
+                feats.append(frame_features(frame, prev))
+            prev = frame
+            i += 1
+    return np.asarray(times), np.asarray(feats, dtype=float).reshape(-1, 3)
+
+def analyze_video(source_path, workers=None, fps=ANALYSIS_FPS, chunk_seconds=CHUNK_SECONDS):
+    # 返回 (每帧时间, 每帧特征, 视频时长)
+    info = probe_video(source_path)
+    if not info["duration"] or not info["width"]:
+        raise RuntimeError(f"无法读取视频信息: {source_path}")
+    duration = info["duration"]
+    width = ANALYSIS_WIDTH
+    height = max(2, round(info["height"] * width / info["width"] / 2) * 2)
+    starts = np.arange(0, duration, chunk_seconds)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(analyze_chunk, source_path, float(s), min(chunk_seconds, duration - s), width, height, fps) for s in starts]
+        results = [f.result() for f in futures]
+    times = np.concatenate([r[0] for r in results]) if results else np.zeros(0)
+    feats = np.concatenate([r[1] for r in results]) if results else np.zeros((0, 3))
+    return times, feats, duration
+
+def per_second_scores(times, feats, duration):
+    # 每秒取各特征的最大值（镜头切换取该秒内的切换次数），以全片分布归一化后加权求和
+    # （与单个特征饱和时的保底分数取大者）并平滑。
+    # 返回 (分数数组, 归一化后的特征字典)，下标即秒数
+    n = int(np.ceil(duration))
+    sec = np.clip(times.astype(int), 0, n - 1)
+    red = np.zeros(n)
+    motion = np.zeros(n)
+    cuts = np.zeros(n)
+    np.maximum.at(red, sec, feats[:, 0])
+    np.maximum.at(motion, sec, feats[:, 1])
+    np.add.at(cuts, sec, feats[:, 2] > CUT_THRESHOLD)
+    # 每秒剪辑频率在几秒窗口内更有意义
+    cut_rate = np.convolve(cuts, np.ones(SMOOTH_SECONDS * 2 + 1), mode="same")
+
+    def norm(x, floor):
+        # 中位数为 0、第 95 百分位为 1；大部分画面平静，只有明显高于常态的部分才得分
+        med, p95 = np.percentile(x, 50), np.percentile(x, 95)
+        return np.clip((x - med) / max(p95 - med, floor), 0, None)
+
+    raw = {"red": red, "motion": motion, "cut": cut_rate}
+    features = {k: norm(v, NORM_FLOOR[k]) for k, v in raw.items()}
+    score = sum(WEIGHTS[k] * v for k, v in features.items())
+    for k, floor_score in SATURATED_SCORE.items():
+        score = np.maximum(score, floor_score * np.minimum(features[k], 1.0))
+    score = np.convolve(score, np.ones(SMOOTH_SECONDS) / SMOOTH_SECONDS, mode="same")
+    return score, features
+
+def find_segments(score, features, threshold=THRESHOLD):
+    # 返回 raw_events 格式的候选事件列表（按时间排序），附带复核用的 _score 字段
+    hot = np.flatnonzero(score >= threshold)
+    if len(hot) == 0:
+        return []
+    # 每个高分秒看作 [t, t+1] 区间，间隔不超过 MERGE_GAP 秒的合并成一段
+    groups = merge_intervals(hot, hot + 1, gap=MERGE_GAP)
+    events = []
+    for g in np.unique(groups):
+        secs = hot[groups == g]
+        start, end = int(secs.min()), int(secs.max()) + 1
+        if end - start < MIN_SEGMENT_SECONDS:
+            continue
+        seg = score[start:end]
+        peak = float(seg.max())
+        level = max(1, sum(peak >= t for t in LEVEL_THRESHOLDS))
+        # 代表片段：区间内 CLIP_SECONDS 秒窗口分数之和最大的起点
+        window = min(CLIP_SECONDS, end - start)
+        sums = np.convolve(seg, np.ones(window), mode="valid")
+        gif_sec = start + int(np.argmax(sums))
+        # 主导特征按各秒的饱和程度（截到 1）比较，避免切换瞬间一两秒的极大值压过整段持续的特征
+        dominant = max(WEIGHTS, key=lambda k: float(np.minimum(features[k][start:end], 1.0).mean()))
+        events.append({
+            "start_time": _fmt_time(start),
+            "end_time": _fmt_time(end),
+            "level": level,
+            "keywords": {"red": "疑似血腥画面", "motion": "激烈动作", "cut": "快速剪辑"}[dominant],
+            "gif_timestamp": _fmt_time(gif_sec),
+            "_score": round(peak, 3),
+        })
+    return events
+
+def write_features_csv(path, score, features):
+    # 每秒一行，便于复核时对照录像查看分数曲线
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["second", "time", "score", *features])
+        for i in range(len(score)):
+            writer.writerow([i, _fmt_time(i), round(float(score[i]), 4), *(round(float(v[i]), 4) for v in features.values())])
+
+def detect(source_path, workers=None, fps=ANALYSIS_FPS, threshold=THRESHOLD, features_csv=None):
+    start = time.perf_counter()
+    times, feats, duration = analyze_video(source_path, workers=workers, fps=fps)
+    score, features = per_second_scores(times, feats, duration)
+    events = find_segments(score, features, threshold)
+    if features_csv:
+        write_features_csv(features_csv, score, features)
+    elapsed = time.perf_counter() - start
+    print(f"{source_path}: 时长 {_fmt_time(duration)}，分析 {len(times)} 帧，候选事件 {len(events)} 个，用时 {elapsed:.1f}s", file=sys.stderr)
+    return events, duration
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从源录像中自动检测候选暴力片段，输出 raw_events 格式的 JSON 供人工复核")
+    parser.add_argument("source", help="源录像路径，或游戏 prefix（在 --sources 目录中查找 {prefix}.*）")
+    parser.add_argument("--sources", default="sources")
+    parser.add_argument("-o", "--output", help="输出 JSON 路径，默认打印到标准输出")
+    parser.add_argument("--features", help="同时输出每秒特征分数的 CSV")
+    parser.add_argument("--workers", type=int, default=None, help="并行解码/分析的进程数，默认等于 CPU 核数")
+    parser.add_argument("--fps", type=float, default=ANALYSIS_FPS, help="分析帧率")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="候选区间的分数阈值，越低候选越多")
+    parser.add_argument("--keep-scores", action="store_true", help="保留 _score 字段（合并进 games.json 前应去掉）")
+    args = parser.parse_args()
+
+    source = args.source if os.path.exists(args.source) else find_source_video(args.sources, args.source)
+    if source is None:
+        print(f"找不到源视频: {args.source}", file=sys.stderr)
+        sys.exit(1)
+    events, duration = detect(source, workers=args.workers, fps=args.fps, threshold=args.threshold, features_csv=args.features)
+    if not args.keep_scores:
+        events = [{k: v for k, v in e.items() if not k.startswith("_")} for e in events]
+    d = int(duration)
+    result = json.dumps({"video_duration_str": f"{d // 3600:02d}:{d // 60 % 60:02d}:{d % 60:02d}", "raw_events": events}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
@@ -0,0 +1,191 @@
+import sys
+import csv
+import numpy as np
+import pandas as pd
+
+# =============================
+# 暴力事件区间索引：按起点排序的 NumPy 数组 + 终点前缀最大值，
+# 支持时间点查询、区间重叠查询，以及按等级批量统计暴露时长/密度
+# =============================
+LEVELS = (1, 2, 3)
+
+def time_str_to_seconds(t: str) -> int:
+    # "MM:SS" 或 "HH:MM:SS" 转为秒数；片段文件名（extract_clips.py）和两个应用查找片段都用这一份
+    parts = t.split(":")
+    if len(parts) == 2:
+        m, s = parts
+        return int(m) * 60 + int(s)
+    elif len(parts) == 3:
+        h, m, s = parts
+        return int(h) * 3600 + int(m) * 60 + int(s)
+    return 0
+
+def time_series_to_seconds(s: pd.Series) -> pd.Series:
+    # 向量化版本：把 "MM:SS" 统一补成 "HH:MM:SS" 后整列解析
+    s = s.astype(str)
+    s = s.where(s.str.count(":") == 2, "00:" + s)
+    return pd.to_timedelta(s).dt.total_seconds().astype(int)
+
+def merge_intervals(starts, ends, gap=0.0, bin_width=None):
+    # 返回每个区间所属的合并组编号：按起点排序后，起点超过此前最大终点 + gap 即开启新组；
+    # 给定 bin_width 时，起点落入新的分箱也会开启新组，保证聚合条数不超过分箱数
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    if len(starts) == 0:
+        return np.zeros(0, dtype=int)
+    order = np.argsort(starts, kind="stable")
+    run_max = np.maximum.accumulate(ends[order])
+    new_group = np.empty(len(order), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = starts[order][1:] > run_max[:-1] + gap
+    if bin_width:
+        bins = np.floor(starts[order] / bin_width)
+        new_group[1:] |= bins[1:] != bins[:-1]
+    groups = np.empty(len(order), dtype=int)
+    groups[order] = np.cumsum(new_group) - 1
+    return groups
+
+class EventIndex:
+    # 事件 ID 即其在 raw_events 中的下标，所有查询都返回 ID 数组（升序）
+    def __init__(self, starts, ends, levels, gif_seconds, gif_timestamps):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.levels = np.asarray(levels, dtype=np.int64)
+        self.gif_seconds = np.asarray(gif_seconds, dtype=np.int64)
+        self.gif_timestamps = np.asarray(gif_timestamps, dtype=object)
+
+        self._order = np.argsort(self.starts, kind="stable")
+        # 每个事件在起点顺序中的位置，用于查找时间轴上的下一个事件
+        self._rank = np.empty_like(self._order)
+        self._rank[self._order] = np.arange(len(self._order))
+        self._sorted_starts = self.starts[self._order]
+        # 按起点排序后终点的前缀最大值：单调不减，可以二分找到第一个可能覆盖某时刻的事件
+        self._run_max = np.maximum.accumulate(self.ends[self._order]) if len(self) else self.ends
+        self._sorted_ends = np.sort(self.ends)
+
+    @classmethod
+    def from_raw_events(cls, raw_events):
+        raw = pd.DataFrame(raw_events, columns=["start_time", "end_time", "level", "gif_timestamp"])
+        return cls(
+            time_series_to_seconds(raw["start_time"]).to_numpy(),
+            time_series_to_seconds(raw["end_time"]).to_numpy(),
+            raw["level"].to_numpy(),
+            time_series_to_seconds(raw["gif_timestamp"]).to_numpy(),
+            raw["gif_timestamp"].to_numpy(),
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def start_order(self):
+        # 按起点排序的事件 ID（起点相同按 ID），即时间轴上从左到右的顺序；构造索引时已排好，直接复用
+        return self._order
+
+    def next_by_start(self, event_id):
+        # 时间轴上紧随其后的事件 ID；已是最后一个时返回 None
+        pos = int(self._rank[event_id]) + 1
+        return int(self._order[pos]) if pos < len(self) else None
+
+    def get(self, event_id):
+        # 按 ID 取单个事件；ID 越界返回 None
+        if not 0 <= event_id < len(self):
+            return None
+        return {
+            "ID": int(event_id),
+            "start": int(self.starts[event_id]),
+            "end": int(self.ends[event_id]),
+            "level": int(self.levels[event_id]),
+            "gif_seconds": int(self.gif_seconds[event_id]),
+            "gif_timestamp": self.gif_timestamps[event_id],
+        }
+
+    def _candidates(self, t0, t1):
+        # 起点 <= t1 且终点 >= t0 的事件：前缀最大值把扫描范围压缩到 [lo, hi)
+        hi = np.searchsorted(self._sorted_starts, t1, side="right")
+        lo = np.searchsorted(self._run_max, t0, side="left")
+        if lo >= hi:
+            return np.zeros(0, dtype=np.int64)
+        ids = self._order[lo:hi]
+        return np.sort(ids[self.ends[ids] >= t0])
+
+    def at(self, t, level=None):
+        # 在时刻 t（秒）处于活动状态的事件
+        ids = self._candidates(t, t)
+        return ids if level is None else ids[self.levels[ids] == level]
+
+    def overlapping(self, t0, t1, level=None):
+        # 与区间 [t0, t1] 有重叠的事件
+        ids = self._candidates(t0, t1)
+        return ids if level is None else ids[self.levels[ids] == level]
+
+    def active_counts(self, times):
+        # 批量查询：每个时刻有多少事件在活动，O(m log n)
+        times = np.asarray(times)
+        started = np.searchsorted(self._sorted_starts, times, side="right")
+        ended = np.searchsorted(self._sorted_ends, times, side="left")
+        return started - ended
+
+    def coverage(self, duration, level=None):
+        # 每一秒是否被（某等级的）事件覆盖，用差分数组一次算完；重叠部分不重复计算
+        mask = np.ones(len(self), dtype=bool) if level is None else self.levels == level
+        diff = np.zeros(int(duration) + 2, dtype=np.int64)
+        starts = np.clip(self.starts[mask], 0, duration)
+        ends = np.clip(self.ends[mask], 0, duration)
+        np.add.at(diff, starts, 1)
+        np.add.at(diff, ends, -1)
+        return np.cumsum(diff)[:int(duration)] > 0
+
+    def exposure_by_level(self, duration):
+        # {等级: 被该等级事件覆盖的总秒数}
+        return {lvl: int(self.coverage(duration, lvl).sum()) for lvl in LEVELS}
+
+    def exposure_per_bin(self, duration, bin_seconds=60):
+        # 返回 {等级: 每个时间段（默认每分钟）内的暴露秒数数组}
+        n_bins = int(np.ceil(duration / bin_seconds))
+        result = {}
+        for lvl in LEVELS:
+            cov = self.coverage(duration, lvl)
+            padded = np.zeros(n_bins * bin_seconds, dtype=np.int64)
+            padded[:len(cov)] = cov
+            result[lvl] = padded.reshape(n_bins, bin_seconds).sum(axis=1)
+        return result
+
+    def density(self, duration, bin_seconds=60):
+        # 返回 {等级: 每个时间段内开始的事件数}
+        n_bins = int(np.ceil(duration / bin_seconds)) or 1
+        result = {}
+        for lvl in LEVELS:
+            bins = np.clip(self.starts[self.levels == lvl] // bin_seconds, 0, n_bins - 1)
+            result[lvl] = np.bincount(bins, minlength=n_bins)
+        return result
+
+def catalogue_report(games):
+    # 对整个游戏目录批量统计，返回每个游戏一行的字典列表
+    rows = []
+    for name, cfg in games.items():
+        duration = time_str_to_seconds(cfg["video_duration_str"])
+        index = EventIndex.from_raw_events(cfg["raw_events"])
+        exposure = index.exposure_by_level(duration)
+        per_minute = index.exposure_per_bin(duration, 60)
+        peak = max(int(v.max()) if len(v) else 0 for v in per_minute.values())
+        rows.append({
+            "game": name,
+            "events": len(index),
+            "duration_sec": duration,
+            **{f"level{lvl}_sec": exposure[lvl] for lvl in LEVELS},
+            "exposure_ratio": round(int(index.coverage(duration).sum()) / duration, 4) if duration else 0.0,
+            "peak_sec_per_minute": peak,
+        })
+    return rows
+
+if __name__ == "__main__":
+    # 用法：python event_index.py [输出.csv]
+    from game_store import GAMES
+
+    rows = catalogue_report(GAMES)
+    out = open(sys.argv[1], "w", newline="", encoding="utf-8") if len(sys.argv) > 1 else sys.stdout
+    writer = csv.DictWriter(out, fieldnames=list(rows[0].keys()) if rows else ["game"])
+    writer.writeheader()
+    writer.writerows(rows)
+    if out is not sys.stdout:
+        out.close()
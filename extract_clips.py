@@ -0,0 +1,102 @@
+import os
+import glob
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from assets import clip_filename
+from ffmpeg_utils import run_ffmpeg
+from game_store import GAMES
+from event_index import time_str_to_seconds
+
+# 与现有事件视频保持一致：3 秒、10 fps、H.264
+CLIP_SECONDS = 3
+CLIP_FPS = 10
+# 单次 ffmpeg 调用最多挂载的输入数，避免命令行过长
+MAX_INPUTS_PER_CALL = 32
+VIDEO_EXTS = (".mp4", ".mkv", ".mov", ".webm")
+
+def plan_clips(prefix, raw_events, target_dir, force=False):
+    # 返回 [(开始秒数, 输出路径)]，片段从 gif_timestamp 开始，并尽量落在事件区间内
+    clips = []
+    for idx, e in enumerate(raw_events):
+        out_path = os.path.join(target_dir, clip_filename(prefix, idx, time_str_to_seconds(e["gif_timestamp"])))
+        if not force and os.path.exists(out_path):
+            continue
+        start = time_str_to_seconds(e["gif_timestamp"])
+        evt_start = time_str_to_seconds(e["start_time"])
+        evt_end = time_str_to_seconds(e["end_time"])
+        if start + CLIP_SECONDS > evt_end:
+            start = max(evt_start, evt_end - CLIP_SECONDS)
+        clips.append((start, out_path))
+    # 按时间排序，ffmpeg 顺着文件向后寻址
+    return sorted(clips)
+
+def extract_batch(source_path, clips):
+    # 每个片段作为一个独立输入，-ss 放在 -i 之前：ffmpeg 先按索引跳到最近的关键帧，
+    # 只解码关键帧到目标时间之间的少量画面，而不是从头解码整段视频
+    args = []
+    for start, _ in clips:
+        args += ["-ss", str(start), "-t", str(CLIP_SECONDS), "-i", source_path]
+    for i, (_, out_path) in enumerate(clips):
+        args += [
+            "-map", f"{i}:v:0", "-an",
+            "-r", str(CLIP_FPS), "-c:v", "libx264", "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            out_path,
+        ]
+    run_ffmpeg(args, outputs=[out_path for _, out_path in clips])
+
+def extract_game_clips(prefix, source_path, raw_events, target_dir, force=False):
+    start_time = time.perf_counter()
+    clips = plan_clips(prefix, raw_events, target_dir, force=force)
+    for i in range(0, len(clips), MAX_INPUTS_PER_CALL):
+        extract_batch(source_path, clips[i:i + MAX_INPUTS_PER_CALL])
+    return len(clips), time.perf_counter() - start_time
+
+def find_source_video(source_dir, prefix):
+    for path in sorted(glob.glob(os.path.join(source_dir, f"{prefix}.*"))):
+        if path.lower().endswith(VIDEO_EXTS):
+            return path
+    return None
+
+def extract_all(games_data, source_dir, target_dir, workers=None, force=False, only=None):
+    os.makedirs(target_dir, exist_ok=True)
+    jobs = []
+    for name, cfg in games_data.items():
+        if only and cfg["prefix"] not in only:
+            continue
+        source_path = find_source_video(source_dir, cfg["prefix"])
+        if source_path is None:
+            print(f"跳过 {name}：{source_dir} 中没有 {cfg['prefix']}.* 源视频")
+            continue
+        jobs.append((name, cfg["prefix"], source_path, cfg["raw_events"]))
+
+    failed = 0
+    # 实际解码在 ffmpeg 子进程中进行，线程池即可让多个游戏并行处理
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = {
+            pool.submit(extract_game_clips, prefix, source_path, events, target_dir, force): name
+            for name, prefix, source_path, events in jobs
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                count, seconds = future.result()
+                print(f"{name}: 生成 {count} 个片段，用时 {seconds:.1f}s")
+            except Exception as e:
+                failed += 1
+                print(f"{name}: 提取失败: {e}")
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="根据 raw_events 从整段录像中批量切出事件片段")
+    parser.add_argument("--sources", default="sources", help="源录像目录，文件名为 {prefix}.mp4 等")
+    parser.add_argument("--target", default=os.path.join("static", "video_cache"))
+    parser.add_argument("--workers", type=int, default=None, help="同时处理的游戏数")
+    parser.add_argument("--game", action="append", help="只处理指定 prefix，可重复")
+    parser.add_argument("--force", action="store_true", help="覆盖已存在的片段")
+    args = parser.parse_args()
+
+    failed = extract_all(GAMES, args.sources, args.target, workers=args.workers, force=args.force, only=args.game)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,69 @@
+import os
+import re
+import shutil
+import hashlib
+import subprocess
+
+# 优先使用 imageio-ffmpeg（moviepy 的依赖）自带的 ffmpeg，其次使用系统 PATH 中的 ffmpeg
+def get_ffmpeg_exe():
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        exe = shutil.which("ffmpeg")
+        if exe is None:
+            raise RuntimeError("找不到 ffmpeg，请先安装 moviepy 或系统 ffmpeg")
+        return exe
+
+def _tmp_output(path):
+    # 与目标同目录的隐藏临时文件，保留扩展名以便 ffmpeg 按扩展名选择封装格式
+    directory, name = os.path.split(path)
+    root, ext = os.path.splitext(name)
+    return os.path.join(directory, f".{root}.tmp{ext}")
+
+def run_ffmpeg(args, outputs=(), **kwargs):
+    # outputs 为 args 中的输出路径。ffmpeg 先写到临时文件，全部成功后再 os.replace 到目标路径，
+    # 失败时删除临时文件、目标保持原样；目标可能是 media_store.py 的硬链接，替换目录项不会改动 blob 的内容
+    tmp_paths = {path: _tmp_output(path) for path in outputs}
+    # 只替换输出位置上的参数，-i 后面的输入即使与输出同名（如原地重新封装）也保持原路径
+    args = [arg if prev == "-i" else tmp_paths.get(arg, arg) for prev, arg in zip([None, *args], args)]
+    cmd = [get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", *args]
+    try:
+        result = subprocess.run(cmd, capture_output=True, **kwargs)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode("utf-8", errors="replace").strip())
+        for path, tmp_path in tmp_paths.items():
+            os.replace(tmp_path, path)
+    finally:
+        for tmp_path in tmp_paths.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return result
+
+# 媒体文件内容的 sha256（分块读取，大视频也不会整块读进内存），各生成/存储脚本共用
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_SIZE_RE = re.compile(r"Stream #.*?Video:.*?\b(\d{2,5})x(\d{2,5})\b")
+
+def probe_video(path):
+    # 只读取容器头信息（ffmpeg -i），不解码画面；返回 {"duration", "width", "height"}，无法识别的字段为 None
+    result = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-i", path], capture_output=True)
+    stderr = result.stderr.decode("utf-8", errors="replace")
+    info = {"duration": None, "width": None, "height": None}
+    match = _DURATION_RE.search(stderr)
+    if match is not None:
+        h, m, s = match.groups()
+        info["duration"] = int(h) * 3600 + int(m) * 60 + float(s)
+    match = _SIZE_RE.search(stderr)
+    if match is not None:
+        info["width"], info["height"] = int(match.group(1)), int(match.group(2))
+    return info
+
+def probe_duration(path):
+    return probe_video(path)["duration"]
@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import threading
+from functools import lru_cache
+from collections.abc import Mapping
+
+# =============================
+# 游戏数据层：data/games.json 是可编辑的源数据，
+# 运行时读取由它生成的 SQLite 索引库（按名称和 prefix 建唯一索引）
+# =============================
+SEED_PATH = os.environ.get("VISRATE_SEED", os.path.join("data", "games.json"))
+DB_PATH = os.environ.get("VISRATE_DB", os.path.join("data", "games.sqlite"))
+
+GAME_FIELDS = ["prefix", "esrb_level", "violence_score", "keywords", "video_duration_str", "summary1", "summary3", "summary_vis"]
+EVENT_FIELDS = ["start_time", "end_time", "level", "keywords", "keywords_vis", "gif_timestamp"]
+
+SCHEMA = """
+CREATE TABLE games (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    prefix TEXT NOT NULL UNIQUE,
+    esrb_level TEXT,
+    violence_score INTEGER,
+    keywords TEXT,
+    video_duration_str TEXT,
+    summary1 TEXT,
+    summary3 TEXT,
+    summary_vis TEXT
+);
+CREATE TABLE events (
+    game_id INTEGER NOT NULL REFERENCES games(id),
+    idx INTEGER NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    level INTEGER,
+    keywords TEXT,
+    keywords_vis TEXT,
+    gif_timestamp TEXT,
+    PRIMARY KEY (game_id, idx)
+) WITHOUT ROWID;
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_build_lock = threading.Lock()
+
+def build_db(seed_path=SEED_PATH, db_path=DB_PATH):
+    # 先写临时文件再原子替换，多个进程同时启动也不会读到半成品
+    with open(seed_path, "rb") as f:
+        raw = f.read()
+    games = json.loads(raw.decode("utf-8"))
+
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        for game_id, g in enumerate(games):
+            conn.execute(
+                f"INSERT INTO games (id, name, {', '.join(GAME_FIELDS)}) VALUES (?, ?, {', '.join('?' * len(GAME_FIELDS))})",
+                [game_id, g["name"], *[g.get(k) for k in GAME_FIELDS]],
+            )
+            conn.executemany(
+                f"INSERT INTO events (game_id, idx, {', '.join(EVENT_FIELDS)}) VALUES (?, ?, {', '.join('?' * len(EVENT_FIELDS))})",
+                [[game_id, idx, *[e.get(k) for k in EVENT_FIELDS]] for idx, e in enumerate(g.get("raw_events", []))],
+            )
+        conn.execute("INSERT INTO meta VALUES ('data_version', ?)", [hashlib.sha256(raw).hexdigest()[:16]])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return len(games)
+
+def _ensure_db(db_path):
+    # 数据库不存在或比源数据旧时自动重建
+    seed_exists = os.path.exists(SEED_PATH)
+    if os.path.exists(db_path) and (not seed_exists or os.path.getmtime(db_path) >= os.path.getmtime(SEED_PATH)):
+        return
+    with _build_lock:
+        if not os.path.exists(db_path) or (seed_exists and os.path.getmtime(db_path) < os.path.getmtime(SEED_PATH)):
+            build_db(SEED_PATH, db_path)
+
+def _connect(db_path):
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+def _db_key(db_path=DB_PATH):
+    # 以 (路径, 修改时间) 作为缓存键，重建数据库后缓存自动失效
+    _ensure_db(db_path)
+    return db_path, os.stat(db_path).st_mtime_ns
+
+@lru_cache(maxsize=8)
+def _load_names(db_key):
+    conn = _connect(db_key[0])
+    try:
+        return tuple(row[0] for row in conn.execute("SELECT name FROM games ORDER BY id"))
+    finally:
+        conn.close()
+
+@lru_cache(maxsize=8)
+def _load_version(db_key):
+    conn = _connect(db_key[0])
+    try:
+        return conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+    finally:
+        conn.close()
+
+@lru_cache(maxsize=256)
+def _load_game(db_key, column, value):
+    # 只有被选中的游戏才会读取长文本与事件列表
+    conn = _connect(db_key[0])
+    try:
+        row = conn.execute(f"SELECT id, name, {', '.join(GAME_FIELDS)} FROM games WHERE {column} = ?", [value]).fetchone()
+        if row is None:
+            return None
+        game = dict(zip(GAME_FIELDS, row[2:]))
+        game["name"] = row[1]
+        game["raw_events"] = [
+            dict(zip(EVENT_FIELDS, e))
+            for e in conn.execute(f"SELECT {', '.join(EVENT_FIELDS)} FROM events WHERE game_id = ? ORDER BY idx", [row[0]])
+        ]
+        return game
+    finally:
+        conn.close()
+
+def list_game_names():
+    return _load_names(_db_key())
+
+def data_version():
+    return _load_version(_db_key())
+
+def get_game(name):
+    # 返回的字典在进程内共享，调用方不要修改
+    game = _load_game(_db_key(), "name", name)
+    if game is None:
+        raise KeyError(name)
+    return game
+
+def get_game_by_prefix(prefix):
+    game = _load_game(_db_key(), "prefix", prefix)
+    if game is None:
+        raise KeyError(prefix)
+    return game
+
+class GameCatalog(Mapping):
+    # 兼容原来 GAMES_DATA 字典的用法：遍历 / keys() 只读名称，按名称取值时才加载该游戏
+    def __getitem__(self, name):
+        return get_game(name)
+
+    def __iter__(self):
+        return iter(list_game_names())
+
+    def __len__(self):
+        return len(list_game_names())
+
+    def __contains__(self, name):
+        return name in list_game_names()
+
+    @property
+    def version(self):
+        return data_version()
+
+GAMES = GameCatalog()
+
+if __name__ == "__main__":
+    # 用法：python game_store.py build
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        count = build_db()
+        print(f"已生成 {DB_PATH}，共 {count} 个游戏。")
+    else:
+        print("用法: python game_store.py build")
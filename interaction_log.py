@@ -0,0 +1,164 @@
+import os
+import sys
+import csv
+import json
+import time
+import atexit
+import sqlite3
+import weakref
+import threading
+from collections import deque
+
+# =============================
+# 交互日志：记录参与者的时间轴点击、游戏选择和系统切换，供研究分析使用。
+# 页面线程只往本会话的内存队列里追加一个元组（微秒级），由后台写入线程定期批量写入
+# SQLite（WAL 模式，多个会话/进程可以同时写）。每个会话的队列有上限，写不过来时丢弃最旧的事件并计数；
+# 会话结束（session_state 被回收）或进程退出时，剩余事件会被一并写入
+# =============================
+DB_PATH = os.environ.get("VISRATE_INTERACTION_DB", os.path.join("data", "interactions.sqlite"))
+FLUSH_INTERVAL = 1.0
+# 单个会话缓冲超过这么多条时立即唤醒写入线程，不必等到下一个周期
+BATCH_SIZE = 200
+MAX_BUFFERED = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    session_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    page TEXT,
+    game TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_interactions_session ON interactions(session_id, ts);
+"""
+
+class SessionBuffer:
+    # 存放在 session_state 中；被回收时由 weakref.finalize 把剩余事件交给写入线程
+    __slots__ = ("logger", "session_id", "events", "__weakref__")
+
+    def __init__(self, logger, session_id):
+        self.logger = logger
+        self.session_id = session_id
+        self.events = deque(maxlen=logger.max_buffered)
+
+    def record(self, event, page=None, game=None, **detail):
+        # 热路径：不做序列化和 IO，只追加一个元组
+        events = self.events
+        if len(events) == events.maxlen:
+            self.logger.dropped += 1
+        events.append((time.time(), self.session_id, event, page, game, detail or None))
+        if len(events) >= self.logger.batch_size:
+            self.logger.wake()
+
+class InteractionLogger:
+    def __init__(self, path=DB_PATH, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE, max_buffered=MAX_BUFFERED):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffered = max_buffered
+        self.written = 0
+        self.dropped = 0
+        self._buffers = weakref.WeakSet()
+        self._buffers_lock = threading.Lock()
+        # 已结束会话剩余的事件，等待下一次写入
+        self._finished = deque()
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="interaction-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def session_buffer(self, session_id):
+        buffer = SessionBuffer(self, session_id)
+        with self._buffers_lock:
+            self._buffers.add(buffer)
+        weakref.finalize(buffer, self._session_ended, buffer.events)
+        return buffer
+
+    def wake(self):
+        self._wake.set()
+
+    def _session_ended(self, events):
+        self._finished.append(events)
+        self._wake.set()
+
+    def _collect(self):
+        # deque 的 append/popleft 是线程安全的，边取边有新事件追加也没关系
+        rows = []
+        sources = []
+        while self._finished:
+            sources.append(self._finished.popleft())
+        with self._buffers_lock:
+            sources += [b.events for b in self._buffers]
+        for events in sources:
+            try:
+                while True:
+                    ts, session_id, event, page, game, detail = events.popleft()
+                    rows.append((ts, session_id, event, page, game, json.dumps(detail, ensure_ascii=False) if detail else None))
+            except IndexError:
+                pass
+        return rows
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _run(self):
+        conn = None
+        while True:
+            if not self._closing:
+                self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            rows = self._collect()
+            if rows:
+                try:
+                    conn = conn or self._connect()
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO interactions (ts, session_id, event, page, game, detail) VALUES (?, ?, ?, ?, ?, ?)", rows
+                        )
+                    self.written += len(rows)
+                except sqlite3.Error as e:
+                    self.dropped += len(rows)
+                    print(f"交互日志写入失败，丢弃 {len(rows)} 条: {e}", file=sys.stderr)
+            elif self._closing:
+                break
+        if conn is not None:
+            conn.close()
+
+    def close(self, timeout=5.0):
+        # 进程退出时把所有会话缓冲中的事件写完
+        if self._closing:
+            return
+        self._closing = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+def export_csv(path, out):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.execute("SELECT id, ts, session_id, event, page, game, detail FROM interactions ORDER BY session_id, ts")
+        writer = csv.writer(out)
+        writer.writerow([c[0] for c in cursor.description])
+        writer.writerows(cursor)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    # 用法：python interaction_log.py export [输出.csv]  —— 导出全部交互记录
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], "w", newline="", encoding="utf-8") as f:
+                export_csv(DB_PATH, f)
+        else:
+            export_csv(DB_PATH, sys.stdout)
+    else:
+        print("用法: python interaction_log.py export [输出.csv]")
@@ -0,0 +1,301 @@
+import os
+import json
+import errno
+import shutil
+import argparse
+import subprocess
+
+from assets import STATIC_ROOT, CLIP_DIR, COVER_DIR, DEMO_DIR, PREVIEW_DIR, COVER_VARIANT_DIR, is_rendition_filename
+from ffmpeg_utils import get_ffmpeg_exe, probe_video, file_sha256
+
+# =============================
+# 内容寻址的媒体存储：片段、GIF、图片按 sha256 存成 data/media_store/blobs/ab/<哈希>，
+# 各目录中应用实际查找的文件名改为指向 blob 的硬链接，内容相同的文件只占一份磁盘空间。
+# 应用和静态服务仍按原路径读取，完全无感知。
+#   ingest    扫描媒体目录，把文件收进存储并把重复文件替换为链接
+#   gc        删除已没有任何文件名引用的 blob（生成脚本用新文件替换旧文件后，旧 blob 即无引用）
+#   status    统计逻辑大小与实际占用
+#   near-dups 可选：对片段做感知哈希（dHash），列出画面几乎相同的片段供人工复核
+#
+# 注意：Streamlit 的 app/static 会拒绝解析到 static/ 之外的符号链接，因此 static/ 下只能用硬链接，
+# 存储目录必须与 static/ 在同一文件系统；无法硬链接时 static/ 下的文件保持原样，只有 static/ 之外的
+# 目录（如 gif_cache/）才退回符号链接。
+# 硬链接共享同一份数据，原地写入会同时改掉所有同内容的文件。blob 与 static/ 下的文件是同一个 inode，
+# 不能设为只读（否则应用目录里的文件也一并只读，covers.py、previews.py 或手工替换都会失败），
+# 因此改由写入方负责：run_ffmpeg 和其余生成脚本都先写临时文件再 os.replace 到目标路径（见 ffmpeg_utils.py），
+# 替换的是目录项，不会改动 blob 的内容
+# =============================
+STORE_ROOT = os.environ.get("VISRATE_MEDIA_STORE", os.path.join("data", "media_store"))
+BLOB_DIR = os.path.join(STORE_ROOT, "blobs")
+DHASH_CACHE_PATH = os.path.join(STORE_ROOT, "dhash.json")
+# 与 assets.py 中的目录一致；gif_cache/ 是 convert_to_mp4.py 的历史输入目录
+MEDIA_DIRS = (
+    CLIP_DIR, DEMO_DIR, COVER_DIR, PREVIEW_DIR, COVER_VARIANT_DIR,
+    os.path.join(STATIC_ROOT, "gif_cache"), "gif_cache",
+)
+MEDIA_EXTS = {".mp4", ".webm", ".gif", ".png", ".jpg", ".jpeg", ".webp", ".avif"}
+CLIP_EXTS = {".mp4", ".webm", ".gif"}
+# dHash：缩放到 9x8 灰度，比较左右相邻像素得到 64 位指纹；每个片段取若干帧，平均汉明距离不超过阈值视为近似重复
+DHASH_FRAMES = (0.2, 0.5, 0.8)
+NEAR_DUP_THRESHOLD = 10
+
+def blob_path(digest):
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+def _iter_blobs():
+    if not os.path.isdir(BLOB_DIR):
+        return
+    for shard in os.scandir(BLOB_DIR):
+        if shard.is_dir():
+            for entry in os.scandir(shard.path):
+                if entry.is_file(follow_symlinks=False) and not entry.name.endswith(".tmp"):
+                    yield entry
+
+def _blob_inodes():
+    # (设备号, inode) -> 哈希；已是 blob 硬链接的文件不必重新计算哈希
+    return {(s.st_dev, s.st_ino): e.name for e in _iter_blobs() for s in [e.stat(follow_symlinks=False)]}
+
+def iter_media_files(dirs=MEDIA_DIRS):
+    # 返回 os.DirEntry；跳过隐藏文件（如 .index.json）和生成中的临时文件
+    for d in dirs:
+        if not os.path.isdir(d):
+            continue
+        for entry in sorted(os.scandir(d), key=lambda e: e.name):
+            name = entry.name
+            if name.startswith(".") or name.endswith(".tmp") or os.path.splitext(name)[1].lower() not in MEDIA_EXTS:
+                continue
+            if entry.is_file():
+                yield entry
+
+def _is_under_static(path):
+    static_root = os.path.realpath(STATIC_ROOT)
+    return os.path.commonpath([os.path.realpath(os.path.dirname(path)), static_root]) == static_root
+
+def _link_to_blob(blob, path):
+    # 用指向 blob 的链接原子替换 path；返回 "hardlink" / "symlink" / None（无法链接，保持原样）
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.link(blob, tmp_path)
+        kind = "hardlink"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK) or _is_under_static(path):
+            return None
+        os.symlink(os.path.relpath(os.path.abspath(blob), os.path.dirname(os.path.abspath(path))), tmp_path)
+        kind = "symlink"
+    os.replace(tmp_path, path)
+    return kind
+
+def ingest(dirs=MEDIA_DIRS, dry_run=False):
+    stats = {"files": 0, "stored": 0, "linked": 0, "skipped": 0, "saved_bytes": 0}
+    known = _blob_inodes()
+    # dry_run 时不真正建 blob，用它记录已“存入”的哈希，后续同内容文件按重复计
+    pending = set()
+    for entry in iter_media_files(dirs):
+        stats["files"] += 1
+        if entry.is_symlink():
+            continue
+        st = entry.stat()
+        if (st.st_dev, st.st_ino) in known:
+            continue
+        digest = file_sha256(entry.path)
+        blob = blob_path(digest)
+        if digest not in pending and not os.path.exists(blob):
+            # 新内容：直接把当前文件硬链接进存储，不复制数据
+            stats["stored"] += 1
+            if dry_run:
+                pending.add(digest)
+                continue
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            try:
+                os.link(entry.path, blob)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+                # 跨文件系统：复制一份进存储，再尝试把原文件换成链接
+                shutil.copy2(entry.path, f"{blob}.tmp")
+                os.replace(f"{blob}.tmp", blob)
+                if _link_to_blob(blob, entry.path) is None:
+                    stats["skipped"] += 1
+            known[(st.st_dev, st.st_ino)] = digest
+            continue
+        # 重复内容：换成指向已有 blob 的链接，释放这一份数据
+        stats["linked"] += 1
+        stats["saved_bytes"] += st.st_size
+        if dry_run:
+            continue
+        if _link_to_blob(blob, entry.path) is None:
+            stats["skipped"] += 1
+            stats["saved_bytes"] -= st.st_size
+    return stats
+
+def _referenced(dirs=MEDIA_DIRS):
+    # 被媒体目录引用的 blob：硬链接按 inode 判断，符号链接按解析后的路径判断
+    inodes, targets = set(), set()
+    for entry in iter_media_files(dirs):
+        if entry.is_symlink():
+            targets.add(os.path.realpath(entry.path))
+        else:
+            st = entry.stat()
+            inodes.add((st.st_dev, st.st_ino))
+    return inodes, targets
+
+def gc(dirs=MEDIA_DIRS, dry_run=False):
+    # 只有媒体目录之外还有别的硬链接（st_nlink > 1）时也视为仍被引用，避免误删
+    inodes, targets = _referenced(dirs)
+    removed, freed = 0, 0
+    for entry in list(_iter_blobs()):
+        st = entry.stat(follow_symlinks=False)
+        if (st.st_dev, st.st_ino) in inodes or os.path.realpath(entry.path) in targets or st.st_nlink > 1:
+            continue
+        removed += 1
+        freed += st.st_size
+        if not dry_run:
+            os.remove(entry.path)
+    if not dry_run and os.path.exists(DHASH_CACHE_PATH):
+        live = {e.name for e in _iter_blobs()}
+        cache = _load_dhash_cache()
+        _save_dhash_cache({k: v for k, v in cache.items() if k in live})
+    return removed, freed
+
+def status(dirs=MEDIA_DIRS):
+    logical, physical, seen = 0, 0, set()
+    files, managed = 0, 0
+    known = _blob_inodes()
+    for entry in iter_media_files(dirs):
+        files += 1
+        # 符号链接跟随到 blob 本身，因此同一份内容只按一次 inode 计入实际占用
+        st = entry.stat()
+        logical += st.st_size
+        key = (st.st_dev, st.st_ino)
+        if key in known:
+            managed += 1
+        if key not in seen:
+            seen.add(key)
+            physical += st.st_size
+    blobs = list(_iter_blobs())
+    orphaned = sum(1 for e in blobs if (e.stat().st_dev, e.stat().st_ino) not in seen)
+    return {
+        "files": files, "managed": managed, "blobs": len(blobs), "orphaned_blobs": orphaned,
+        "logical_bytes": logical, "physical_bytes": physical,
+    }
+
+# =============================
+# 近似重复检测（dHash）
+# =============================
+def _load_dhash_cache():
+    if not os.path.exists(DHASH_CACHE_PATH):
+        return {}
+    with open(DHASH_CACHE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_dhash_cache(cache):
+    os.makedirs(STORE_ROOT, exist_ok=True)
+    tmp_path = DHASH_CACHE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, sort_keys=True)
+    os.replace(tmp_path, DHASH_CACHE_PATH)
+
+def _dhash(gray):
+    # gray: 9x8 灰度像素（按行排列的 72 字节）
+    bits = 0
+    for row in range(8):
+        line = gray[row * 9:(row + 1) * 9]
+        for col in range(8):
+            bits = (bits << 1) | (line[col] > line[col + 1])
+    return bits
+
+def clip_dhashes(path, frames=DHASH_FRAMES):
+    # 按时长比例取若干帧，每帧由 ffmpeg 直接缩放成 9x8 灰度原始像素；GIF 同样适用
+    duration = probe_video(path)["duration"] or 0
+    hashes = []
+    for frac in frames:
+        cmd = [
+            get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error",
+            "-ss", f"{duration * frac:.3f}", "-i", path,
+            "-frames:v", "1", "-vf", "scale=9:8,format=gray", "-f", "rawvideo", "pipe:1",
+        ]
+        out = subprocess.run(cmd, capture_output=True).stdout
+        if len(out) >= 72:
+            hashes.append(_dhash(out[:72]))
+    return hashes
+
+def _distance(a, b):
+    n = min(len(a), len(b))
+    if n == 0:
+        return 64
+    return sum(bin(x ^ y).count("1") for x, y in zip(a[:n], b[:n])) / n
+
+def _clip_key(name):
+    # 同一事件的 GIF 与由它转码的 MP4 本来就是同一画面，不算重复：按去掉扩展名的文件名归并
+    return os.path.splitext(name)[0]
+
+def find_near_duplicates(dirs=(CLIP_DIR, os.path.join(STATIC_ROOT, "gif_cache")), threshold=NEAR_DUP_THRESHOLD):
+    # 返回近似重复组列表，每组为 [(路径, 哈希), ...]；码率阶梯文件与源文件画面相同，跳过
+    known = _blob_inodes()
+    cache = _load_dhash_cache()
+    clips = []
+    for entry in iter_media_files(dirs):
+        if os.path.splitext(entry.name)[1].lower() not in CLIP_EXTS or is_rendition_filename(entry.name):
+            continue
+        st = entry.stat()
+        digest = known.get((st.st_dev, st.st_ino)) or file_sha256(entry.path)
+        if digest not in cache:
+            cache[digest] = clip_dhashes(entry.path)
+        clips.append((entry.path, digest, cache[digest]))
+    _save_dhash_cache(cache)
+
+    # 并查集：任意两段距离不超过阈值即归为一组（内容完全相同的由 ingest 处理，这里跳过）
+    parent = list(range(len(clips)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(clips)):
+        for j in range(i + 1, len(clips)):
+            (pi, di, hi), (pj, dj, hj) = clips[i], clips[j]
+            if di == dj or _clip_key(os.path.basename(pi)) == _clip_key(os.path.basename(pj)):
+                continue
+            if _distance(hi, hj) <= threshold:
+                parent[find(i)] = find(j)
+    groups = {}
+    for i, (path, digest, _) in enumerate(clips):
+        groups.setdefault(find(i), []).append((path, digest))
+    return [g for g in groups.values() if len({d for _, d in g}) > 1]
+
+def _fmt_size(n):
+    return f"{n / 1024 / 1024:.1f} MB"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="内容寻址的媒体存储：去重、垃圾回收与近似重复检测")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("ingest", help="把媒体目录中的文件收进存储，重复内容替换为硬链接")
+    p.add_argument("--dry-run", action="store_true", help="只统计，不修改文件")
+    p = sub.add_parser("gc", help="删除已无文件名引用的 blob")
+    p.add_argument("--dry-run", action="store_true", help="只列出可删除的数量和大小")
+    sub.add_parser("status", help="统计逻辑大小与实际磁盘占用")
+    p = sub.add_parser("near-dups", help="用 dHash 找出画面几乎相同的片段")
+    p.add_argument("--threshold", type=float, default=NEAR_DUP_THRESHOLD, help="平均汉明距离阈值（0~64），越小越严格")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        s = ingest(dry_run=args.dry_run)
+        print(f"扫描 {s['files']} 个文件：新存入 {s['stored']} 个，重复替换为链接 {s['linked']} 个，"
+              f"节省 {_fmt_size(s['saved_bytes'])}" + (f"，{s['skipped']} 个无法链接保持原样" if s["skipped"] else ""))
+    elif args.command == "gc":
+        removed, freed = gc(dry_run=args.dry_run)
+        print(f"{'可删除' if args.dry_run else '已删除'} {removed} 个无引用 blob，{_fmt_size(freed)}")
+    elif args.command == "status":
+        s = status()
+        print(f"媒体文件 {s['files']} 个（已入库 {s['managed']} 个），blob {s['blobs']} 个（无引用 {s['orphaned_blobs']} 个）")
+        print(f"逻辑大小 {_fmt_size(s['logical_bytes'])}，实际占用 {_fmt_size(s['physical_bytes'])}")
+    elif args.command == "near-dups":
+        groups = find_near_duplicates(threshold=args.threshold)
+        if not groups:
+            print("未发现近似重复的片段")
+        for i, group in enumerate(groups, 1):
+            print(f"第 {i} 组（{len(group)} 个片段）：")
+            for path, digest in group:
+                print(f"  {path}  {digest[:12]}")
@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+from collections import defaultdict
+
+# =============================
+# 热路径埋点：记录每次 rerun 中各阶段（数据准备、图表构建、资源定位、媒体输出）的耗时、
+# 缓存命中率和发送的字节数，以 Prometheus 文本格式导出（本地 HTTP 端点或文本文件），
+# 并可按会话把每次 rerun 的明细写成 JSONL。
+#
+# 全部通过环境变量开启，未开启时 span() 返回共享的空上下文，开销只有一次函数调用：
+#   VISRATE_METRICS=1                 只在进程内统计
+#   VISRATE_METRICS_PORT=9464         在 127.0.0.1:9464/metrics 提供 Prometheus 文本
+#   VISRATE_METRICS_FILE=path.prom    每隔 METRICS_FILE_INTERVAL 秒原子写出一次（node_exporter textfile）
+#   VISRATE_TRACE_DIR=traces/         每个会话一个 {session_id}.jsonl，每行一次 rerun 的各阶段耗时
+# =============================
+METRICS_PORT = int(os.environ.get("VISRATE_METRICS_PORT") or 0)
+METRICS_FILE = os.environ.get("VISRATE_METRICS_FILE")
+TRACE_DIR = os.environ.get("VISRATE_TRACE_DIR")
+ENABLED = bool(os.environ.get("VISRATE_METRICS") or METRICS_PORT or METRICS_FILE or TRACE_DIR)
+METRICS_FILE_INTERVAL = 15.0
+# 直方图分桶（秒），覆盖从毫秒级缓存命中到数秒的冷启动
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL = nullcontext()
+_lock = threading.Lock()
+# 每个会话的脚本在各自的线程中运行，当前 rerun 的上下文放在线程局部变量里
+_local = threading.local()
+_started = False
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+_phases = defaultdict(_Histogram)      # (page, phase) -> 直方图
+_reruns = defaultdict(_Histogram)      # page -> 直方图
+_cache_lookups = defaultdict(int)      # cache -> 次数
+_cache_misses = defaultdict(int)
+_bytes_sent = defaultdict(int)         # kind -> 字节数
+
+# =============================
+# 记录接口
+# =============================
+
+@contextmanager
+def _rerun(page):
+    _local.page = page
+    _local.trace = []
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _reruns[page].observe(elapsed)
+        if TRACE_DIR:
+            _dump_trace(page, start, elapsed, _local.trace)
+        _local.page = None
+        _local.trace = None
+
+def rerun(page):
+    # 包住一次脚本执行；page 作为各阶段指标的标签
+    return _rerun(page) if ENABLED else _NULL
+
+@contextmanager
+def _span(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        page = getattr(_local, "page", None)
+        with _lock:
+            _phases[(page or "", phase)].observe(elapsed)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.append({"phase": phase, "ms": round(elapsed * 1000, 3)})
+
+def span(phase):
+    return _span(phase) if ENABLED else _NULL
+
+def add_bytes(kind, n):
+    # 记录发往浏览器的媒体字节数（st.video / st.image 会把整个文件交给媒体管理器）
+    if not ENABLED or not n:
+        return
+    with _lock:
+        _bytes_sent[kind] += n
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.append({"bytes": kind, "n": n})
+
+def cached(name, cache):
+    # 代替直接使用缓存装饰器：@cached("build_timeline", st.cache_resource(...))。
+    # 函数体只在缓存未命中时执行，据此统计命中率；未开启时与原装饰器完全相同
+    def decorator(func):
+        if not ENABLED:
+            return cache(func)
+
+        @functools.wraps(func)
+        def body(*args, **kwargs):
+            with _lock:
+                _cache_misses[name] += 1
+            return func(*args, **kwargs)
+
+        cached_func = cache(body)
+
+        @functools.wraps(func)
+        def lookup(*args, **kwargs):
+            with _lock:
+                _cache_lookups[name] += 1
+            return cached_func(*args, **kwargs)
+
+        lookup.clear = cached_func.clear
+        return lookup
+    return decorator
+
+def count_lookup(name, hit):
+    # 不经 cached() 的自管缓存（如 clip_cache.py）手动上报命中情况，与 cached() 共用同一组计数器
+    if not ENABLED:
+        return
+    with _lock:
+        _cache_lookups[name] += 1
+        if not hit:
+            _cache_misses[name] += 1
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else "no-session"
+    except Exception:
+        return "no-session"
+
+def _dump_trace(page, start, elapsed, trace):
+    record = {"ts": time.time(), "page": page, "total_ms": round(elapsed * 1000, 3), "spans": trace}
+    try:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        with open(os.path.join(TRACE_DIR, f"{_session_id()}.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"写入会话追踪失败: {e}", file=sys.stderr)
+
+# =============================
+# 导出
+# =============================
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _histogram_lines(name, labels, hist):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(BUCKETS, hist.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+    lines.append(f"{name}_sum{{{labels}}} {hist.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+    return lines
+
+def render():
+    # 返回 Prometheus 文本格式的全部指标
+    with _lock:
+        lines = [
+            "# HELP visrate_rerun_seconds 每次脚本 rerun 的总耗时",
+            "# TYPE visrate_rerun_seconds histogram",
+        ]
+        for page, hist in sorted(_reruns.items()):
+            lines += _histogram_lines("visrate_rerun_seconds", f'page="{_label(page)}"', hist)
+        lines += [
+            "# HELP visrate_phase_seconds 页面各阶段耗时",
+            "# TYPE visrate_phase_seconds histogram",
+        ]
+        for (page, phase), hist in sorted(_phases.items()):
+            lines += _histogram_lines("visrate_phase_seconds", f'page="{_label(page)}",phase="{_label(phase)}"', hist)
+        lines += ["# HELP visrate_cache_lookups_total 缓存函数调用次数", "# TYPE visrate_cache_lookups_total counter"]
+        lines += [f'visrate_cache_lookups_total{{cache="{_label(k)}"}} {v}' for k, v in sorted(_cache_lookups.items())]
+        lines += ["# HELP visrate_cache_misses_total 缓存未命中次数", "# TYPE visrate_cache_misses_total counter"]
+        lines += [f'visrate_cache_misses_total{{cache="{_label(k)}"}} {v}' for k, v in sorted(_cache_misses.items())]
+        lines += ["# HELP visrate_bytes_sent_total 发送给浏览器的媒体字节数", "# TYPE visrate_bytes_sent_total counter"]
+        lines += [f'visrate_bytes_sent_total{{kind="{_label(k)}"}} {v}' for k, v in sorted(_bytes_sent.items())]
+    return "\n".join(lines) + "\n"
+
+def write_file(path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+def _serve(port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"指标端点: http://127.0.0.1:{port}/metrics", file=sys.stderr)
+
+def start():
+    # 启动导出线程，进程内只执行一次；未配置端口和文件时什么也不做
+    global _started
+    with _lock:
+        if _started or not ENABLED:
+            return
+        _started = True
+    if METRICS_PORT:
+        try:
+            _serve(METRICS_PORT)
+        except OSError as e:
+            print(f"指标端点启动失败: {e}", file=sys.stderr)
+    if METRICS_FILE:
+        def loop():
+            while True:
+                time.sleep(METRICS_FILE_INTERVAL)
+                try:
+                    write_file(METRICS_FILE)
+                except OSError as e:
+                    print(f"写入指标文件失败: {e}", file=sys.stderr)
+        threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+
+if __name__ == "__main__":
+    # 用法：python metrics.py summary traces/   —— 汇总会话追踪中各阶段的耗时
+    if len(sys.argv) > 2 and sys.argv[1] == "summary":
+        phases = defaultdict(list)
+        for name in sorted(os.listdir(sys.argv[2])):
+            if not name.endswith(".jsonl"):
+                continue
+            with open(os.path.join(sys.argv[2], name), "r", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    phases[(record["page"], "rerun")].append(record["total_ms"])
+                    for s in record["spans"]:
+                        if "phase" in s:
+                            phases[(record["page"], s["phase"])].append(s["ms"])
+        print(f"{'页面':<10}{'阶段':<16}{'次数':>6}{'p50 ms':>10}{'p95 ms':>10}")
+        for (page, phase), values in sorted(phases.items()):
+            values.sort()
+            p50 = values[len(values) // 2]
+            p95 = values[max(int(len(values) * 0.95 + 0.5) - 1, 0)]
+            print(f"{page:<12}{phase:<18}{len(values):>6}{p50:>10.1f}{p95:>10.1f}")
+    else:
+        print("用法: python metrics.py summary <追踪目录>")
@@ -0,0 +1,148 @@
+import os
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import CLIP_DIR, PREVIEW_DIR, clip_filename, poster_filename, sprite_filename
+from ffmpeg_utils import run_ffmpeg
+
+# =============================
+# 事件预览：从每个事件片段中截取一帧海报图，再把同一游戏的海报拼成一张低分辨率雪碧图，
+# 悬停时间轴上的方块即可预览，只有真正点击时才加载完整 MP4
+# =============================
+POSTER_WIDTH = 320
+TILE_WIDTH = 160
+TILE_HEIGHT = 90
+JPEG_QUALITY = 70
+
+def extract_poster(clip_path, poster_path):
+    # 取片段中间一帧；-ss 放在 -i 前面按关键帧快速定位
+    from ffmpeg_utils import probe_duration
+    duration = probe_duration(clip_path) or 0
+    run_ffmpeg([
+        "-ss", f"{duration / 2:.2f}", "-i", clip_path,
+        "-frames:v", "1", "-vf", f"scale={POSTER_WIDTH}:-2", "-q:v", "4",
+        poster_path,
+    ], outputs=[poster_path])
+
+def build_sprite(poster_paths, sprite_path):
+    # 按事件 ID 顺序横向拼接，缺少海报的位置留灰色空白
+    from PIL import Image, ImageOps
+
+    sheet = Image.new("RGB", (TILE_WIDTH * max(len(poster_paths), 1), TILE_HEIGHT), (230, 230, 230))
+    for i, path in enumerate(poster_paths):
+        if path is None or not os.path.exists(path):
+            continue
+        with Image.open(path) as img:
+            tile = ImageOps.fit(img.convert("RGB"), (TILE_WIDTH, TILE_HEIGHT))
+        sheet.paste(tile, (i * TILE_WIDTH, 0))
+    # 先写临时文件再替换，不原地覆盖（旧文件可能是 media_store.py 的硬链接）
+    tmp_path = f"{sprite_path}.tmp"
+    sheet.save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    os.replace(tmp_path, sprite_path)
+
+def _is_fresh(output, source):
+    return os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(source)
+
+def generate_game_previews(prefix, raw_events, force=False):
+    from event_index import EventIndex
+
+    index = EventIndex.from_raw_events(raw_events)
+    posters, changed = [], force
+    for evt_id in range(len(index)):
+        clip_path = os.path.join(CLIP_DIR, clip_filename(prefix, evt_id, int(index.gif_seconds[evt_id])))
+        poster_path = os.path.join(PREVIEW_DIR, poster_filename(prefix, evt_id))
+        if not os.path.exists(clip_path):
+            posters.append(None)
+            continue
+        if force or not _is_fresh(poster_path, clip_path):
+            extract_poster(clip_path, poster_path)
+            changed = True
+        posters.append(poster_path)
+
+    sprite_path = os.path.join(PREVIEW_DIR, sprite_filename(prefix))
+    if changed or not os.path.exists(sprite_path):
+        build_sprite(posters, sprite_path)
+    return sum(p is not None for p in posters), len(posters)
+
+def generate_all(games, workers=None, force=False, only=None):
+    os.makedirs(PREVIEW_DIR, exist_ok=True)
+    jobs = [(name, cfg["prefix"], cfg["raw_events"]) for name, cfg in games.items() if not only or cfg["prefix"] in only]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = [(name, pool.submit(generate_game_previews, prefix, events, force)) for name, prefix, events in jobs]
+        for name, future in futures:
+            try:
+                done, total = future.result()
+                print(f"{name}: {done}/{total} 个事件已生成预览")
+            except Exception as e:
+                print(f"{name}: 预览生成失败: {e}")
+
+# 时间轴悬停预览：方块的 customdata[0] 是事件 ID（-1 为补齐 y 轴的占位方块），也就是该事件在雪碧图中的格子序号。
+# 悬停事件由页面脚本接管，在 Plotly 的悬停标签旁显示对应的一格和关键词，不触发 rerun，也不加载视频。
+# 实时应用与 build_static.py 导出的页面共用这段脚本
+HOVER_PREVIEW_JS = """
+function vrAttachHoverPreview(gd, getConfig) {
+  if (gd.__vrPreviewAttached) return;
+  gd.__vrPreviewAttached = true;
+  var doc = gd.ownerDocument;
+  var tip = doc.createElement("div");
+  tip.style.cssText = "position:fixed; z-index:10000; display:none; pointer-events:none; background:#fff; border-radius:6px; box-shadow:0 4px 8px rgba(0,0,0,0.25); overflow:hidden;";
+  var tile = doc.createElement("div");
+  var label = doc.createElement("div");
+  label.style.cssText = "font-size:12px; color:#333; text-align:center; padding:2px 6px;";
+  tip.appendChild(tile);
+  tip.appendChild(label);
+  doc.body.appendChild(tip);
+  gd.on("plotly_hover", function (ev) {
+    var cfg = getConfig();
+    var point = ev.points && ev.points[0];
+    var id = point && point.customdata ? parseInt(point.customdata[0], 10) : -1;
+    if (!cfg || isNaN(id) || id < 0 || id >= cfg.count) { tip.style.display = "none"; return; }
+    tile.style.cssText = "width:" + cfg.tileWidth + "px; height:" + cfg.tileHeight + "px; background:url('" + cfg.url + "') -" + (id * cfg.tileWidth) + "px 0;";
+    label.textContent = cfg.labels[id] || "";
+    label.style.display = label.textContent ? "block" : "none";
+    var e = ev.event || {};
+    tip.style.left = ((e.clientX || 0) + 16) + "px";
+    tip.style.top = Math.max(4, (e.clientY || 0) - cfg.tileHeight - 32) + "px";
+    tip.style.display = "block";
+  });
+  gd.on("plotly_unhover", function () { tip.style.display = "none"; });
+}
+"""
+
+def hover_preview_config(sprite_url, count, keywords=None):
+    # count 为事件数（雪碧图的格子数）；keywords 按事件 ID 排列，悬停时显示在预览图下方
+    return {
+        "url": sprite_url, "count": count, "tileWidth": TILE_WIDTH, "tileHeight": TILE_HEIGHT,
+        "labels": list(keywords) if keywords else [],
+    }
+
+def hover_preview_html(config, chart_key="timeline_chart"):
+    # 交给 st.html(..., unsafe_allow_javascript=True)：脚本运行在页面本身，找到 key 对应的 Plotly 图表后挂上悬停处理。
+    # 图表在每次 rerun 后可能重新挂载，定时检查；当前游戏的配置放在 window 上，切换游戏或没有雪碧图（None）时随之更新
+    config_json = json.dumps(config, ensure_ascii=False).replace("</", "<\\/")
+    return f"""
+    <script>
+    {HOVER_PREVIEW_JS}
+    window.__vrPreviewConfig = {config_json};
+    if (!window.__vrPreviewTimer) {{
+      window.__vrPreviewTimer = setInterval(function () {{
+        // 带 key 的元素容器有 st-key-<key> 类；找不到时退回页面上唯一的 Plotly 图表
+        var gd = document.querySelector(".st-key-{chart_key} .js-plotly-plot");
+        var all = document.querySelectorAll(".js-plotly-plot");
+        if (!gd && all.length === 1) gd = all[0];
+        if (gd && gd.on && gd._fullLayout) vrAttachHoverPreview(gd, function () {{ return window.__vrPreviewConfig; }});
+      }}, 500);
+    }}
+    </script>
+    """
+
+if __name__ == "__main__":
+    from game_store import GAMES
+
+    parser = argparse.ArgumentParser(description="为事件片段生成海报帧与雪碧图")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--game", action="append", help="只处理指定 prefix，可重复")
+    parser.add_argument("--force", action="store_true", help="全部重新生成")
+    args = parser.parse_args()
+    generate_all(GAMES, workers=args.workers, force=args.force, only=args.game)
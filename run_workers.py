@@ -0,0 +1,223 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+import urllib.request
+
+import shared_cache
+from clip_cache import DEFAULT_MAX_MB
+
+# =============================
+# 多 worker 部署：一个 Streamlit 进程只用得上一个核。这里在本机启动 N 个 worker（各占一个端口，只监听 127.0.0.1），
+# 由前面的 nginx 做粘性路由——同一浏览器的页面、websocket 和 /media 请求必须落在同一个 worker 上，
+# 因为会话状态和 st.video 的媒体文件都只存在于那个进程的内存里。
+#   - 事件表、区间索引、时间轴图表经 shared_cache.py 的磁盘缓存在 worker 之间共享，整台机器只算一次
+#   - 片段 LRU（clip_cache.py）仍在各进程内，总容量按 worker 数均分；片段文件本身由操作系统页缓存共享
+#   - 启动前若 build_static.py 的导出已过期则先重新构建，各 worker 直接读取预构建的图表 JSON
+#
+# 用法：
+#   python run_workers.py --workers 4 --nginx deploy/visrate.conf   # 生成 nginx 配置并启动 4 个 worker
+#   nginx -c $(pwd)/deploy/visrate.conf                               # 另开终端启动代理（或 include 进已有配置）
+# 未识别的参数原样传给每个 worker 的 streamlit run；纯静态页面位于 /app/static/export/index.html
+# =============================
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(REPO_ROOT, "data", "shared_cache")
+BASE_PORT = 8601
+LISTEN_PORT = 8501
+# 浏览器首次访问时由 nginx 发放的会话 cookie，upstream 按它做一致性哈希。
+# 不用 ip_hash：实验室的参与者往往在同一个 NAT 之后，会全部落到同一个 worker
+STICKY_COOKIE = "visrate_sid"
+
+NGINX_TEMPLATE = """# 由 run_workers.py 生成：{workers} 个 Streamlit worker，粘性路由 + 静态资源由 nginx 直接提供
+worker_processes auto;
+events {{ worker_connections 4096; }}
+
+http {{
+    include       {mime_types};
+    sendfile      on;
+
+    upstream visrate {{
+        hash $visrate_sid consistent;
+{servers}
+    }}
+
+    # 没有 cookie 时用本次请求的 $request_id 作为会话标识，并通过 Set-Cookie 发给浏览器
+    map $cookie_{cookie} $visrate_sid {{
+        ""      $request_id;
+        default $cookie_{cookie};
+    }}
+    map $cookie_{cookie} $visrate_set_cookie {{
+        ""      "{cookie}=$request_id; Path=/; HttpOnly; SameSite=Lax";
+        default "";
+    }}
+    map $http_upgrade $connection_upgrade {{
+        default upgrade;
+        ""      close;
+    }}
+
+    server {{
+        listen {listen};
+
+        # static/ 下的片段、封面、预览图按 URL 中的 ?v=修改时间 区分版本，可以长期缓存。
+        # build_static.py 导出的页面也在这里（/app/static/export/index.html），
+        # 页面里 ../video_cache/ 等相对 URL 正好解析回本 location
+        location /app/static/ {{
+            alias {static_root}/;
+            expires 7d;
+            add_header Cache-Control "public";
+        }}
+
+        location / {{
+            add_header Set-Cookie $visrate_set_cookie;
+            proxy_pass http://visrate;
+            proxy_http_version 1.1;
+            proxy_set_header Upgrade $http_upgrade;
+            proxy_set_header Connection $connection_upgrade;
+            proxy_set_header Host $host;
+            proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+            proxy_read_timeout 86400;
+            proxy_buffering off;
+        }}
+    }}
+}}
+"""
+
+def nginx_config(ports, listen=LISTEN_PORT, static_root=os.path.join(REPO_ROOT, "static"), mime_types="/etc/nginx/mime.types"):
+    servers = "\n".join(f"        server 127.0.0.1:{p} max_fails=3 fail_timeout=10s;" for p in ports)
+    return NGINX_TEMPLATE.format(
+        workers=len(ports), servers=servers, listen=listen, cookie=STICKY_COOKIE,
+        static_root=os.path.abspath(static_root), mime_types=mime_types,
+    )
+
+def worker_env(i, n, cache_dir, clip_cache_mb):
+    env = dict(os.environ)
+    env["VISRATE_WORKER"] = str(i)
+    env["VISRATE_SHARED_CACHE"] = cache_dir
+    env["VISRATE_CLIP_CACHE_MB"] = str(clip_cache_mb / n)
+    # 埋点端口/文件按 worker 区分，避免互相覆盖（见 metrics.py）
+    if env.get("VISRATE_METRICS_PORT"):
+        env["VISRATE_METRICS_PORT"] = str(int(env["VISRATE_METRICS_PORT"]) + i)
+    if env.get("VISRATE_METRICS_FILE"):
+        stem, ext = os.path.splitext(env["VISRATE_METRICS_FILE"])
+        env["VISRATE_METRICS_FILE"] = f"{stem}.{i}{ext}"
+    return env
+
+def _spawn(script, port, env, log_path, extra_args=()):
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", script,
+        "--server.headless", "true", "--server.port", str(port), "--server.address", "127.0.0.1",
+        "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false",
+        *extra_args,
+    ]
+    log = open(log_path, "a")
+    return subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+def wait_healthy(ports, procs, timeout=60):
+    deadline = time.time() + timeout
+    pending = set(ports)
+    while pending and time.time() < deadline:
+        for port, proc in zip(ports, procs):
+            if port not in pending:
+                continue
+            if proc.poll() is not None:
+                raise RuntimeError(f"端口 {port} 的 worker 启动失败（退出码 {proc.returncode}）")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                    if r.status == 200:
+                        pending.discard(port)
+            except OSError:
+                pass
+        time.sleep(0.3)
+    if pending:
+        raise RuntimeError(f"等待 worker 启动超时: {sorted(pending)}")
+
+def ensure_static_export():
+    # 导出过期时先重新构建，避免每个 worker 各自现场绘图
+    check = subprocess.run([sys.executable, "build_static.py", "--check"], cwd=REPO_ROOT, capture_output=True)
+    if check.returncode != 0:
+        subprocess.run([sys.executable, "build_static.py"], cwd=REPO_ROOT, check=True)
+
+def spawn_worker(i, n, port, script="app.py", cache_dir=DEFAULT_CACHE_DIR,
+                 clip_cache_mb=DEFAULT_MAX_MB, log_dir=None, extra_args=()):
+    # 启动第 i 个 worker（共 n 个）；start_workers 和监督循环中的重启共用，保证参数一致
+    log_dir = log_dir or os.path.join(REPO_ROOT, "data")
+    env = worker_env(i, n, cache_dir, clip_cache_mb)
+    return _spawn(script, port, env, os.path.join(log_dir, f"worker_{port}.log"), extra_args)
+
+def start_workers(n, script="app.py", base_port=BASE_PORT, cache_dir=DEFAULT_CACHE_DIR,
+                  clip_cache_mb=DEFAULT_MAX_MB, log_dir=None, extra_args=()):
+    # 返回 [(端口, Popen)]；共享缓存目录在启动前清空，旧代码生成的条目不会被新 worker 读到
+    os.makedirs(cache_dir, exist_ok=True)
+    shared_cache.clear(cache_dir)
+    log_dir = log_dir or os.path.join(REPO_ROOT, "data")
+    os.makedirs(log_dir, exist_ok=True)
+    ports = [base_port + i for i in range(n)]
+    procs = [spawn_worker(i, n, port, script, cache_dir, clip_cache_mb, log_dir, extra_args) for i, port in enumerate(ports)]
+    try:
+        wait_healthy(ports, procs)
+    except Exception:
+        stop_workers(procs)
+        raise
+    return list(zip(ports, procs))
+
+def stop_workers(procs, timeout=15):
+    for proc in procs:
+        if proc.poll() is None:
+            proc.terminate()
+    deadline = time.time() + timeout
+    for proc in procs:
+        try:
+            proc.wait(timeout=max(0.1, deadline - time.time()))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="启动多个 Streamlit worker，并生成粘性路由的 nginx 配置")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker 数，默认等于 CPU 核数")
+    parser.add_argument("--script", default="app.py")
+    parser.add_argument("--base-port", type=int, default=BASE_PORT, help="第 i 个 worker 监听 base-port + i")
+    parser.add_argument("--listen", type=int, default=LISTEN_PORT, help="nginx 对外监听的端口")
+    parser.add_argument("--nginx", default=None, help="把 nginx 配置写到该路径")
+    parser.add_argument("--mime-types", default="/etc/nginx/mime.types", help="nginx 配置中 include 的 mime.types 路径")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="跨进程共享缓存目录")
+    parser.add_argument("--clip-cache-mb", type=float, default=DEFAULT_MAX_MB, help="片段 LRU 的总容量，按 worker 数均分")
+    parser.add_argument("--config-only", action="store_true", help="只生成 nginx 配置，不启动 worker")
+    # 其余参数原样传给每个 streamlit run，例如 --server.maxUploadSize 50
+    args, extra_args = parser.parse_known_args()
+
+    ports = [args.base_port + i for i in range(args.workers)]
+    if args.nginx:
+        os.makedirs(os.path.dirname(os.path.abspath(args.nginx)), exist_ok=True)
+        with open(args.nginx, "w", encoding="utf-8") as f:
+            f.write(nginx_config(ports, args.listen, mime_types=args.mime_types))
+        print(f"nginx 配置已写入 {args.nginx}（对外端口 {args.listen}）")
+    if args.config_only:
+        return 0
+
+    ensure_static_export()
+    workers = start_workers(args.workers, args.script, args.base_port, args.cache_dir, args.clip_cache_mb, extra_args=extra_args)
+    print(f"已启动 {len(workers)} 个 worker: " + ", ".join(f"127.0.0.1:{p}" for p, _ in workers))
+
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    # 监督循环：worker 意外退出时原端口重启（其上的会话会断开，浏览器重连后由 nginx 路由到同一端口）
+    while not stopping:
+        time.sleep(1)
+        for i, (port, proc) in enumerate(workers):
+            if proc.poll() is not None and not stopping:
+                print(f"worker {port} 已退出（退出码 {proc.returncode}），正在重启", file=sys.stderr)
+                workers[i] = (port, spawn_worker(i, len(workers), port, args.script, args.cache_dir, args.clip_cache_mb, extra_args=extra_args))
+    stop_workers([proc for _, proc in workers])
+    print("所有 worker 已停止")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import os
+import sys
+import pickle
+import hashlib
+import functools
+
+# =============================
+# 跨进程共享缓存：多 worker 部署（run_workers.py）时，各进程的 st.cache_resource 互不相通，
+# 同一份事件表、区间索引、时间轴图表会在每个进程里各算一遍。这里在进程内缓存之下再加一层磁盘缓存：
+# 结果用 pickle 写到 VISRATE_SHARED_CACHE 目录（先写临时文件再 os.replace，读者不会看到半个文件），
+# 同一个键由文件锁保证整台机器只计算一次，其余进程等待后直接读取。
+# 未设置 VISRATE_SHARED_CACHE 时（单进程运行）装饰器原样返回函数，没有任何开销。
+#
+# 键由缓存名和参数的 repr 组成，参数里已经带有数据版本；绘图代码变化时由 run_workers.py 启动时清空目录
+# =============================
+CACHE_DIR = os.environ.get("VISRATE_SHARED_CACHE")
+MAX_BYTES = int(float(os.environ.get("VISRATE_SHARED_CACHE_MB", 512)) * 1024 * 1024)
+ENABLED = bool(CACHE_DIR)
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl：不加锁，最坏情况是几个进程同时计算同一个键，结果仍然正确
+    fcntl = None
+
+def _key_path(name, args, kwargs):
+    digest = hashlib.sha256(repr((args, sorted(kwargs.items()))).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(CACHE_DIR, f"{name}-{digest}.pkl")
+
+def _load(path):
+    try:
+        with open(path, "rb") as f:
+            return True, pickle.load(f)
+    except FileNotFoundError:
+        return False, None
+    except Exception as e:
+        # 文件损坏或类定义已变化：当作未命中，重新计算后覆盖
+        print(f"共享缓存读取失败，重新计算: {path}: {e}", file=sys.stderr)
+        return False, None
+
+def _store(path, value):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    _prune()
+
+def _prune():
+    # 总大小超过上限时按最近访问时间删除最旧的条目
+    entries = []
+    with os.scandir(CACHE_DIR) as it:
+        for e in it:
+            if e.name.endswith(".pkl"):
+                st = e.stat()
+                entries.append((max(st.st_atime, st.st_mtime), st.st_size, e.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+def cached(name):
+    # 放在 st.cache_resource 之内使用：
+    #   @metrics.cached("load_index", st.cache_resource(show_spinner=False))
+    #   @shared_cache.cached("load_index")
+    #   def load_index(...)
+    # 进程内命中时根本不会走到这里；进程内未命中时先查磁盘，磁盘也没有才真正计算
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            path = _key_path(name, args, kwargs)
+            hit, value = _load(path)
+            if hit:
+                return value
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with _FileLock(path[:-4] + ".lock"):
+                # 拿到锁后再查一次：等待期间可能已有其他进程算好
+                hit, value = _load(path)
+                if hit:
+                    return value
+                value = func(*args, **kwargs)
+                _store(path, value)
+            return value
+        return wrapper
+    return decorator
+
+def clear(cache_dir=CACHE_DIR):
+    # 删除全部条目（run_workers.py 启动 worker 之前调用，避免读到旧代码生成的结果）
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith((".pkl", ".lock", ".tmp")):
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
+
+def stats(cache_dir=CACHE_DIR):
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return {"entries": 0, "bytes": 0}
+    sizes = [e.stat().st_size for e in os.scandir(cache_dir) if e.name.endswith(".pkl")]
+    return {"entries": len(sizes), "bytes": sum(sizes)}
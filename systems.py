@@ -0,0 +1,387 @@
+import os
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import metrics
+import shared_cache
+from game_store import GAMES
+from assets import AssetManifest, CLIP_DIR, COVER_DIR, DEMO_DIR, clip_filename, cover_filename, demo_filename
+from interaction_log import InteractionLogger
+from clip_cache import ClipCache
+from previews import hover_preview_config, hover_preview_html
+from covers import COVER_DISPLAY_WIDTH, picture_html
+
+# =============================
+# 研究平台（app.py）的数据配置、缓存层和各页面函数。
+# 作为普通模块导入，只在首次导入时执行一次，之后每次 rerun 直接复用；
+# 本模块及其顶层依赖都不导入 pandas / Plotly，主页不必为它们付出导入时间
+# =============================
+
+# =============================
+# 1. 数据配置
+# =============================
+# 视频实际显示宽度（CSS 像素），用于挑选码率阶梯中最小够用的一档：
+# 系统一的视频在 [1, 2, 1] 布局的中间列，约为 wide 布局内容区的一半；系统三占满整行
+CLIP_DISPLAY_WIDTH = 700
+DEMO_DISPLAY_WIDTH = 1400
+
+# 游戏目录按需从 data/ 下的索引库加载：下拉框只读名称，选中后才加载该游戏的总结与事件
+GAMES_DATA = GAMES
+
+# =============================
+# 2. 缓存层
+# =============================
+
+@metrics.cached("load_events", st.cache_resource(show_spinner=False))
+@shared_cache.cached("load_events")
+def load_events(game_name: str, data_version: str):
+    # 按 (游戏, 数据版本) 缓存事件表；数据版本是源数据的哈希，更新 data/games.json 后缓存自动失效
+    from timeline import events_frame
+    return events_frame(GAMES_DATA[game_name]["raw_events"])
+
+@metrics.cached("load_index", st.cache_resource(show_spinner=False))
+@shared_cache.cached("load_index")
+def load_index(game_name: str, data_version: str):
+    # 事件区间索引：点击定位、视野查询都走二分查找
+    from event_index import EventIndex
+    return EventIndex.from_raw_events(GAMES_DATA[game_name]["raw_events"])
+
+def render_timeline(game_name: str, df, index, view=None):
+    # 实际绘制时间轴图表；事件很多时 build_timeline_figure 会自动合并区间或切换到 WebGL。
+    # build_static.py 预构建图表 JSON 时调用的也是这个函数，两边的样式保持一致
+    from timeline import build_timeline_figure
+    from event_index import time_str_to_seconds
+    total_sec = time_str_to_seconds(GAMES_DATA[game_name]["video_duration_str"])
+    fig, _ = build_timeline_figure(df, total_sec, view, index=index)
+    fig.update_layout(
+        height=240, 
+        margin=dict(l=20, r=20, t=10, b=20), 
+        xaxis=dict(tickformat="%M:%S", title="视频时间轴"), 
+        yaxis=dict(title=None, tickfont=dict(size=14))
+    )
+    return fig
+
+@metrics.cached("build_timeline", st.cache_resource(show_spinner=False, max_entries=64))
+@shared_cache.cached("build_timeline")
+def build_timeline(game_name: str, data_version: str, view=None):
+    # 按 (游戏, 数据版本, 缩放窗口) 缓存基础图表，点击触发的 rerun 不再重建。
+    # 未缩放的整段时间轴优先读取 build_static.py 预构建的图表 JSON（数据版本和绘图代码都一致时才用）
+    from build_static import load_prebuilt_figure
+    df = load_events(game_name, data_version)
+    fig = load_prebuilt_figure(game_name, data_version) if view is None else None
+    if fig is None:
+        fig = render_timeline(game_name, df, load_index(game_name, data_version), view)
+    return df, fig
+
+@st.cache_resource(show_spinner=False)
+def get_asset_manifest():
+    # 进程内只扫描一次静态资源，之后由后台线程在目录或数据变化时刷新
+    manifest = AssetManifest(GAMES_DATA)
+    manifest.start_watcher()
+    return manifest
+
+@st.cache_resource(show_spinner=False)
+def get_clip_cache():
+    # 进程内所有会话共享的片段 LRU，容量由 VISRATE_CLIP_CACHE_MB 配置（见 clip_cache.py）
+    return ClipCache()
+
+def clip_prefetch_hint(data):
+    # 把“下一个可能点击的片段”提前登记到 Streamlit 的媒体服务，并用 <link rel="prefetch"> 让浏览器空闲时下载。
+    # 媒体 URL 由文件内容决定，之后点击该事件时 st.video 给出的是同一个 URL，可直接用上已下载的内容
+    from streamlit import runtime
+    if not runtime.exists():
+        return
+    url = runtime.get_instance().media_file_mgr.add(data, "video/mp4", "visrate.clip_prefetch")
+    st.markdown(f'<link rel="prefetch" href="{url}" as="video">', unsafe_allow_html=True)
+
+@st.cache_resource(show_spinner=False)
+def get_interaction_logger():
+    # 进程内共享一个后台写入线程，所有会话的交互事件都由它批量写入 data/interactions.sqlite
+    return InteractionLogger()
+
+def log_interaction(event, **fields):
+    # 只是追加到本会话的内存队列，不会拖慢 rerun；page 记录事件发生时所在的页面
+    buffer = st.session_state.get("_interaction_buffer")
+    if buffer is None:
+        ctx = get_script_run_ctx()
+        buffer = get_interaction_logger().session_buffer(ctx.session_id if ctx else "unknown")
+        st.session_state._interaction_buffer = buffer
+    buffer.record(event, page=st.session_state.get("page"), **fields)
+
+def log_game_change(key):
+    # 下拉框的 on_change 回调，在 rerun 之前执行
+    log_interaction("game_select", game=st.session_state[key])
+
+# =============================
+# 3. 页面片段：实时页面和 build_static.py 导出的静态页面共用同一份 HTML
+# =============================
+
+def summary1_html(game_cfg):
+    return f'<div style="background-color:#f5f7fa; padding:20px; border-radius:8px; font-size:18px; color:#2c3e50; line-height:1.6;">{game_cfg["summary1"]}</div>'
+
+def esrb_html(data):
+    return f"""
+    <div style="background-color:#f8f9fa; padding:20px; border-radius:10px; border-left:8px solid #e74c3c; margin-bottom:20px;">
+        <p style="font-size:20px;"><strong>年龄评级:</strong> <span style="font-size:28px; color:#e74c3c;">{data['esrb_level']}</span></p>
+        <p style="font-size:18px;"><strong>暴力相关的关键词:</strong> {data['keywords']}</p>
+    </div>
+    """
+
+def violence_score_html(data):
+    # --- 核心修改：将频率作为标题 ---
+    score = data.get("violence_score", 0)
+    filled_circles = "●" * score
+    empty_circles = "○" * (5 - score)
+    
+    # 使用 HTML 模拟图片中的标题样式
+    return f"""
+        <div style="display: flex; align-items: center; margin-top: 25px; margin-bottom: 10px;">
+            <span style="font-size: 26px; font-weight: bold; margin-right: 20px;">暴力与恐怖频率：</span>
+            <span style="font-size: 32px; letter-spacing: 5px;">{filled_circles}{empty_circles}</span>
+        </div>
+    """
+
+def summary3_html(data):
+    # 紧随其后的文字描述块
+    return f"""
+        <div style="font-size:22px; padding:25px; background-color:#fff4f4; border-radius:12px; color:#2c3e50; line-height:1.6; border: 1px solid #ffebeb;">
+            {data["summary3"]}
+        </div>
+    """
+
+# =============================
+# 4. 各子系统界面函数
+# =============================
+
+def show_system_1():
+    # pandas / Plotly 只有系统一需要，首次进入系统一时才导入（之后由 sys.modules 缓存）
+    import plotly.graph_objects as go
+    from timeline import box_to_view
+
+    # 1. 状态初始化
+    if 'guide_active' not in st.session_state:
+        st.session_state.guide_active = True
+
+    st.header("📊 系统一：Vis-Rate 暴力程度时间轴分析")
+    
+    game_list = list(GAMES_DATA.keys())
+    selected_game = st.selectbox("选择游戏", game_list, key="s1_game", on_change=log_game_change, args=("s1_game",))
+    game_cfg = GAMES_DATA[selected_game]
+
+    # --- 核心修复逻辑：在所有组件渲染前获取点击数据 ---
+    # 直接从 session_state 缓存中读取，这样即使图表刷新，点击数据也不会丢失
+    selection_state = st.session_state.get("timeline_chart", {})
+    selection = selection_state.get("selection", {})
+    points = selection.get("points", [])
+
+    # 框选用于放大：记录缩放窗口并按更细的粒度重新分箱，框选本身不触发播放
+    view_key = f"s1_view_{selected_game}"
+    box_view = box_to_view(selection)
+    if box_view is not None:
+        points = []
+        if box_view != st.session_state.get("s1_last_box"):
+            st.session_state.s1_last_box = box_view
+            st.session_state[view_key] = box_view
+            log_interaction("timeline_zoom", game=selected_game, view=list(box_view))
+    view = st.session_state.get(view_key)
+    
+    clicked_info = None
+    if points:
+        # 只要有点选动作，立即关闭引导
+        st.session_state.guide_active = False
+        # 提取点击的 ID 和 时间戳字符串
+        clicked_info = points[0].get("customdata")
+
+    # 2. 数据准备
+    st.subheader("📄 游戏内容总结")
+    st.markdown(summary1_html(game_cfg), unsafe_allow_html=True)
+
+    st.subheader("📊 暴力程度时间轴")
+    # 数据表与基础图表来自缓存，每次点击只需叠加引导标注
+    with metrics.span("data_prep"):
+        index = load_index(selected_game, GAMES_DATA.version)
+    with metrics.span("figure_build"):
+        df, fig = build_timeline(selected_game, GAMES_DATA.version, view)
+    # 切换到新游戏时在后台按时间轴顺序预读全部片段，点击时不必再读盘。
+    # 顺序取自缓存的事件索引（构造时已按起点排好），不在每次 rerun 中重新排序
+    if st.session_state.get("s1_prefetched") != (selected_game, GAMES_DATA.version):
+        st.session_state.s1_prefetched = (selected_game, GAMES_DATA.version)
+        with metrics.span("asset_resolve"):
+            manifest = get_asset_manifest()
+            clips = [manifest.clip(game_cfg["prefix"], int(i)) for i in index.start_order()]
+            get_clip_cache().prefetch([c.for_width(CLIP_DISPLAY_WIDTH) for c in clips if c is not None])
+    if view is not None and st.button("↺ 重置时间轴缩放", key="s1_reset_view"):
+        del st.session_state[view_key]
+        log_interaction("timeline_zoom_reset", game=selected_game)
+        st.rerun()
+
+    # --- 引导 UI：移到方块下方 (ay 正值) ---
+    if selected_game == game_list[0] and st.session_state.guide_active:
+        with metrics.span("figure_build"):
+            # 复制一份再加标注，避免污染缓存中的图表对象
+            fig = go.Figure(fig)
+            target_row = df.iloc[0]
+            fig.add_annotation(
+                x=target_row['center'],
+                y=target_row['level'],
+                text="✨ 点击查看 3s 事件视频",
+                showarrow=True, 
+                arrowhead=3, 
+                arrowsize=1.2, 
+                arrowwidth=2,
+                ax=0, 
+                ay=55,  # 设置为正值，使引导气泡出现在方块下方
+                font=dict(size=15, color="#333"),
+                bgcolor="#FFF9C4", 
+                bordercolor="#FBC02D",
+                borderwidth=2, 
+                borderpad=8, 
+                opacity=0.95
+            )
+    
+    # 渲染图表（必须保留 key="timeline_chart"）
+    with metrics.span("figure_emit"):
+        st.plotly_chart(fig, use_container_width=True, on_select="rerun", key="timeline_chart")
+
+    # 悬停预览：鼠标移到方块上时显示雪碧图中该事件的一格（只加载几 KB），点击方块后才加载完整视频
+    with metrics.span("asset_resolve"):
+        sprite = get_asset_manifest().sprite(game_cfg["prefix"])
+    preview = hover_preview_config(sprite.url, len(index), df["keywords"].tolist()) if sprite is not None else None
+    st.html(hover_preview_html(preview), unsafe_allow_javascript=True)
+
+    # 4. 视频显示逻辑（使用在代码开头截获的点击信息）
+    st.subheader("🎬 事件动态预览")
+    
+    # --- 找到你的视频显示逻辑部分，修改如下 ---
+
+    # 通过事件索引按 ID 直接定位，不再解析 customdata 里的时间字符串
+    event = None
+    if clicked_info and clicked_info[0] != -1:
+        event = index.get(int(clicked_info[0]))
+
+    if event is not None:
+        # 选中状态会保留到之后的每次 rerun，只在点击的事件变化时记录一次
+        if st.session_state.get("s1_last_click") != (selected_game, event["ID"]):
+            st.session_state.s1_last_click = (selected_game, event["ID"])
+            log_interaction("event_click", game=selected_game, event_id=event["ID"], level=event["level"], gif_timestamp=event["gif_timestamp"])
+        prefix = game_cfg["prefix"]
+        with metrics.span("asset_resolve"):
+            clip = get_asset_manifest().clip(prefix, event["ID"])
+        
+        if clip is not None:
+            # 1. 创建三列，[1, 2, 1] 表示左右各占 1/4，中间占 2/4 (即 50%)
+            # 你可以根据需要调整比例，如 [1, 1, 1] 会更小
+            col1, col2, col3 = st.columns([1, 2, 1]) 
+            
+            with col2, metrics.span("media_emit"): # 在中间这一列显示视频
+                rendition = clip.for_width(CLIP_DISPLAY_WIDTH)
+                # 内容来自共享 LRU：已预读时不读盘
+                st.video(get_clip_cache().get(rendition), format="video/mp4", autoplay=True, loop=True, muted=True)
+                metrics.add_bytes("clip", rendition.size)
+
+            # 时间轴上的下一个事件最可能被接着点击；只在它已经预读进内存时才提示浏览器，不为此读盘
+            next_id = index.next_by_start(event["ID"])
+            if next_id is not None:
+                next_clip = get_asset_manifest().clip(prefix, next_id)
+                data = get_clip_cache().peek(next_clip.for_width(CLIP_DISPLAY_WIDTH)) if next_clip is not None else None
+                if data is not None:
+                    clip_prefetch_hint(data)
+        else:
+            st.error(f"找不到视频文件: {os.path.join(CLIP_DIR, clip_filename(prefix, event['ID'], event['gif_seconds']))}")
+
+def show_system_2():
+    st.header("🖼️ 系统二：ESRB 游戏年龄评级")
+    selected_game = st.selectbox("选择游戏", list(GAMES_DATA.keys()), key="s2_game", on_change=log_game_change, args=("s2_game",))
+    data = GAMES_DATA[selected_game]
+
+    # 修改为上下布局
+    st.subheader("📋 评级详情")
+    st.markdown(esrb_html(data), unsafe_allow_html=True)
+
+    st.subheader("🖼️ 游戏封面图")
+    with metrics.span("asset_resolve"):
+        cover = get_asset_manifest().cover(data['prefix'])
+        variants = get_asset_manifest().cover_variants(data['prefix'])
+    if variants:
+        # 预先缩放的 AVIF/WebP/PNG 变体走静态 URL，由浏览器按格式支持和像素比挑选，可被浏览器缓存
+        with metrics.span("media_emit"):
+            st.markdown(picture_html(variants, alt=selected_game, caption=f"{selected_game} 评级参考图"), unsafe_allow_html=True)
+    elif cover is not None:
+        # 没有生成变体时退回原图（python covers.py 生成）；控制图片宽度，防止在上下布局中显得过大
+        with metrics.span("media_emit"):
+            st.image(cover.path, caption=f"{selected_game} 评级参考图", width=COVER_DISPLAY_WIDTH)
+            metrics.add_bytes("cover", cover.size)
+    else:
+        st.warning(f"图片未找到: {os.path.join(COVER_DIR, cover_filename(data['prefix']))}")
+
+def show_system_3():
+    st.header("🎥 系统三：Common Sense Media 暴力内容总结")
+    selected_game = st.selectbox("选择游戏", list(GAMES_DATA.keys()), key="s3_game", on_change=log_game_change, args=("s3_game",))
+    data = GAMES_DATA[selected_game]
+
+    st.markdown(violence_score_html(data), unsafe_allow_html=True)
+    st.markdown(summary3_html(data), unsafe_allow_html=True)
+
+    # 下方的视频演示
+    st.write("---") # 添加分割线美化布局
+    st.subheader("📽️ 暴力内容典型片段演示")
+    with metrics.span("asset_resolve"):
+        demo = get_asset_manifest().demo(data['prefix'])
+    
+    if demo is not None:
+        with metrics.span("media_emit"):
+            rendition = demo.for_width(DEMO_DISPLAY_WIDTH)
+            st.video(rendition.path, format="video/mp4", autoplay=True, loop=True, muted=True)
+            metrics.add_bytes("demo", rendition.size)
+    else:
+        st.warning(f"视频演示文件未找到: {os.path.join(DEMO_DIR, demo_filename(data['prefix']))}")
+
+# =============================
+# 5. 主页与侧边栏
+# =============================
+
+def show_home():
+    st.write("# ")
+    st.markdown("<h1 style='text-align: center;'>欢迎您参加关于“电子游戏评级信息呈现方式”的学术研究项目</h1>", unsafe_allow_html=True)
+    st.write("---")
+
+    _, center_col, _ = st.columns([1, 2, 1])
+
+    with center_col:
+        st.write("### 请选择下方其中一个系统进行体验：")
+        if st.button("🚀 系统 1：Vis-Rate 暴力程度时间轴分析", use_container_width=True):
+            log_interaction("page_enter", target="系统 1")
+            st.session_state.page = "系统 1"
+            st.rerun()
+    
+        st.write("") 
+        if st.button("🖼️ 系统 2：ESRB 游戏年龄评级", use_container_width=True):
+            log_interaction("page_enter", target="系统 2")
+            st.session_state.page = "系统 2"
+            st.rerun()
+        
+        st.write("") 
+        if st.button("🎥 系统 3：Common Sense Media 暴力内容总结", use_container_width=True):
+            log_interaction("page_enter", target="系统 3")
+            st.session_state.page = "系统 3"
+            st.rerun()
+
+def show_sidebar():
+    with st.sidebar:
+        st.title("🚀 系统切换")
+        nav_selection = st.radio(
+            "前往：",
+            ["系统 1", "系统 2", "系统 3"],
+            index=["系统 1", "系统 2", "系统 3"].index(st.session_state.page)
+        )
+        if nav_selection != st.session_state.page:
+            log_interaction("system_switch", target=nav_selection)
+            st.session_state.page = nav_selection
+            st.rerun()
+    
+        st.write("---")
+        if st.button("⬅️ 返回主页"):
+            log_interaction("page_enter", target="home")
+            st.session_state.page = 'home'
+            st.rerun()
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from event_index import time_series_to_seconds, merge_intervals
+
+# =============================
+# 暴力程度时间轴：事件表构造与分级细节（LOD）渲染，两个应用共用
+# =============================
+LEVEL_MAP = {1: "轻度", 2: "中度", 3: "重度"}
+LEVEL_ORDER = ["轻度", "中度", "重度"]
+LEVEL_COLORS = {"轻度": "#FDB462", "中度": "#FB6A4A", "重度": "#CB181D"}
+BASE_TIME = pd.Timestamp("1970-01-01")
+
+# 视野内事件数不超过该值时逐条绘制，否则合并相邻/重叠的区间
+DETAIL_MAX_EVENTS = 300
+# 聚合模式下把视野等分为 TARGET_BINS 个分箱，箱内间隙小于箱宽的区间会被合并
+TARGET_BINS = 400
+# 聚合后仍超过该条数时改用 WebGL 线段（Scattergl）绘制
+WEBGL_MIN_BARS = 1000
+WEBGL_LINE_WIDTH = 18
+
+def events_frame(raw_events) -> pd.DataFrame:
+    # raw_events -> 每个事件一行，同时保留秒数列（计算用）和时间戳列（绘图用）
+    raw = pd.DataFrame(raw_events, columns=["start_time", "end_time", "level", "keywords", "gif_timestamp"])
+    start_sec = time_series_to_seconds(raw["start_time"])
+    end_sec = time_series_to_seconds(raw["end_time"])
+    start = BASE_TIME + pd.to_timedelta(start_sec, unit="s")
+    end = BASE_TIME + pd.to_timedelta(end_sec, unit="s")
+    return pd.DataFrame({
+        "ID": np.arange(len(raw)),
+        "start_sec": start_sec,
+        "end_sec": end_sec,
+        "start": start,
+        "end": end,
+        "center": start + (end - start) / 2,
+        "level_num": raw["level"],
+        "level": raw["level"].map(LEVEL_MAP),
+        "keywords": raw["keywords"],
+        "gif_timestamp_str": raw["gif_timestamp"],
+    })
+
+def aggregate_events(df: pd.DataFrame, bin_width: float) -> pd.DataFrame:
+    # 按等级分别合并同一分箱内相邻/重叠的区间，每个合并条取组内最长的事件作为代表，点击时播放它的片段
+    parts = []
+    for lvl, sub in df.groupby("level", sort=False):
+        groups = merge_intervals(sub["start_sec"].to_numpy(), sub["end_sec"].to_numpy(), gap=bin_width, bin_width=bin_width)
+        sub = sub.assign(group=groups, duration=sub["end_sec"] - sub["start_sec"])
+        rep = sub.loc[sub.groupby("group")["duration"].idxmax(), ["group", "ID", "gif_timestamp_str"]]
+        agg = sub.groupby("group").agg(start_sec=("start_sec", "min"), end_sec=("end_sec", "max"), count=("ID", "size"))
+        parts.append(agg.join(rep.set_index("group")).assign(level=lvl))
+    if not parts:
+        return pd.DataFrame(columns=["start_sec", "end_sec", "count", "ID", "gif_timestamp_str", "level"])
+    return pd.concat(parts, ignore_index=True)
+
+def visible_events(df: pd.DataFrame, view=None, index=None) -> pd.DataFrame:
+    # 有 EventIndex 时用二分查找取视野内的事件，否则退回整列比较
+    if view is None:
+        return df
+    v0, v1 = view
+    if index is not None:
+        return df.iloc[index.overlapping(v0, v1)]
+    return df[(df["end_sec"] >= v0) & (df["start_sec"] <= v1)]
+
+def _detail_figure(df, x_range, hover_data=None):
+    # 事件较少时保持原来的 px.timeline 样式，一条事件一个方块。
+    # plotly.express 导入较慢，只在真正现场绘图时导入（有 build_static.py 预构建的图表时不需要）
+    import plotly.express as px
+
+    plot_df = df
+    # 一次性补齐缺失的等级行，保证 y 轴完整
+    missing = [lvl for lvl in LEVEL_ORDER if lvl not in set(df["level"])]
+    if missing:
+        plot_df = pd.concat([df, pd.DataFrame({"ID": -1, "start": BASE_TIME, "end": BASE_TIME, "level": missing, "gif_timestamp_str": ""})], ignore_index=True)
+    return px.timeline(
+        plot_df, x_start="start", x_end="end", y="level", color="level",
+        category_orders={"level": LEVEL_ORDER},
+        custom_data=["ID", "gif_timestamp_str"],
+        hover_data=hover_data,
+        color_discrete_map=LEVEL_COLORS,
+        range_x=x_range
+    )
+
+def _aggregate_figure(agg, x_range):
+    fig = go.Figure()
+    use_webgl = len(agg) > WEBGL_MIN_BARS
+    for lvl in LEVEL_ORDER:
+        sub = agg[agg["level"] == lvl]
+        start = BASE_TIME + pd.to_timedelta(sub["start_sec"], unit="s")
+        end = BASE_TIME + pd.to_timedelta(sub["end_sec"], unit="s")
+        customdata = np.column_stack([sub["ID"].to_numpy(), sub["gif_timestamp_str"].to_numpy(), sub["count"].to_numpy()]) if len(sub) else None
+        hovertemplate = "%{customdata[2]} 个事件<extra>" + lvl + "</extra>"
+        if use_webgl:
+            # 每个区间画成一段粗线：(起点, 终点, 断开)，两个端点携带相同的 customdata
+            n = len(sub)
+            xs = np.empty(n * 3, dtype=object)
+            xs[0::3], xs[1::3], xs[2::3] = start.to_numpy(), end.to_numpy(), None
+            cd = np.repeat(customdata, 3, axis=0) if n else None
+            fig.add_trace(go.Scattergl(
+                x=xs, y=[lvl] * (n * 3), mode="lines+markers", name=lvl,
+                line=dict(color=LEVEL_COLORS[lvl], width=WEBGL_LINE_WIDTH), marker=dict(size=2, color=LEVEL_COLORS[lvl]),
+                customdata=cd, hovertemplate=hovertemplate, connectgaps=False,
+            ))
+        else:
+            # 与 px.timeline 相同的画法：水平条形，base 为起点，长度为毫秒时长
+            fig.add_trace(go.Bar(
+                base=start, x=(sub["end_sec"] - sub["start_sec"]).to_numpy() * 1000, y=[lvl] * len(sub),
+                orientation="h", name=lvl, marker_color=LEVEL_COLORS[lvl],
+                customdata=customdata, hovertemplate=hovertemplate,
+            ))
+    fig.update_layout(barmode="overlay", dragmode="select")
+    fig.update_xaxes(type="date", range=x_range)
+    fig.update_yaxes(categoryorder="array", categoryarray=LEVEL_ORDER)
+    return fig
+
+def build_timeline_figure(df: pd.DataFrame, total_sec: int, view=None, hover_data=None, index=None):
+    # 返回 (figure, mode)，mode 为 "detail" / "aggregate" / "webgl"。
+    # view 为 (起始秒, 结束秒) 的缩放窗口；None 表示整段视频
+    v0, v1 = view if view is not None else (0, total_sec)
+    x_range = [BASE_TIME + pd.Timedelta(seconds=v0), BASE_TIME + pd.Timedelta(seconds=v1)]
+    shown = visible_events(df, view, index)
+    if len(shown) <= DETAIL_MAX_EVENTS:
+        return _detail_figure(shown, x_range, hover_data=hover_data), "detail"
+    agg = aggregate_events(shown, bin_width=(v1 - v0) / TARGET_BINS)
+    fig = _aggregate_figure(agg, x_range)
+    return fig, "webgl" if len(agg) > WEBGL_MIN_BARS else "aggregate"
+
+def box_to_view(selection):
+    # 把框选区域（dragmode="select"）换算成 (起始秒, 结束秒)，用于放大后重新分箱
+    boxes = (selection or {}).get("box") or []
+    if not boxes:
+        return None
+    xs = boxes[0].get("x") or []
+    if len(xs) < 2:
+        return None
+    secs = sorted((pd.Timestamp(x) - BASE_TIME).total_seconds() for x in xs[:2])
+    if secs[1] - secs[0] < 1:
+        return None
+    return int(secs[0]), int(np.ceil(secs[1]))
@@ -1,10 +1,20 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 import os
 import base64
 
-import time
+from game_store import GAMES
+from assets import AssetManifest, CLIP_DIR, clip_filename
+from event_index import EventIndex, time_str_to_seconds
+from previews import hover_preview_config, hover_preview_html
+from timeline import events_frame, build_timeline_figure, box_to_view
+
+# 视频投递方式：
+#   "static" —— 通过 .streamlit/config.toml 中开启的静态服务按 URL 流式加载（默认）
+#   "inline" —— 旧方式，把整个 MP4 以 base64 内联进 markdown，仅用于排查问题
+VIDEO_DELIVERY = "static"
+# 预览视频标签的显示宽度，按它挑选码率阶梯中最小够用的一档
+VIDEO_DISPLAY_WIDTH = 1000
 
 # 1. 在 app.py 顶部（或适当位置）定义这个转换函数
 def get_video_base64(file_path):
@@ -20,56 +30,33 @@ st.set_page_config(
     layout="wide"
 )
 
-LEVEL_MAP = {1: "轻度", 2: "中度", 3: "重度"}
-LEVEL_ORDER = ["轻度", "中度", "重度"]
-
-# (GAMES_CONFIG 部分保持不变...)
-GAMES_CONFIG = {
-    "Red Dead Redemption 2": {
-        "file_prefix": "Red",
-        "summary": "本作包含频繁的第一人称及第三人称枪战，并通过慢动作镜头特写子弹穿透敌人、血液自伤口喷涌而出的暴力画面。此外，游戏中还存在野兽撕咬人类并导致大量出血的血腥场景，以及静态的动物尸体图像。",
-        "video_duration_str": "01:01:03",
-        "raw_events": [
-            {"start_time": "07:30", "end_time": "11:23", "level": 2, "keywords": "与人枪战", "gif_timestamp": "09:29"},
-            {"start_time": "14:28", "end_time": "16:15", "level": 1, "keywords": "空手打斗", "gif_timestamp": "15:47"},
-            {"start_time": "26:34", "end_time": "27:04", "level": 1, "keywords": "马的尸体", "gif_timestamp": "26:38"},
-            {"start_time": "31:05", "end_time": "36:50", "level": 2, "keywords": "与野兽枪战，野兽撕咬", "gif_timestamp": "34:02"},
-            {"start_time": "51:04", "end_time": "59:36", "level": 2, "keywords": "与人枪战", "gif_timestamp": "55:02"},
-        ]
-    },
-    "Detroit: Become Human": {
-        "file_prefix": "Detroit",
-        "summary": "本作的核心剧情聚焦于仿生人与人类之间的尖锐冲突，并深入探讨了仿生人内部的分裂——例如，作为执法者的仿生人与其普通同类之间的对立。游戏中包含对犯罪现场的直接描绘，其中会涉及人类尸体与血迹。此外，剧情还包含枪击仿生人的暴力场面，其标志性的蓝色血液是本作一个独特的视觉特征。",
-        "video_duration_str": "01:00:06",
-        "raw_events": [
-            {"start_time": "02:20", "end_time": "09:29", "level": 1, "keywords": "案发现场", "gif_timestamp": "02:27"},
-            {"start_time": "15:13", "end_time": "16:45", "level": 1, "keywords": "枪击仿生人", "gif_timestamp": "16:09"},
-        ]
-    },
-    "Hades": {
-        "file_prefix": "Hades",
-        "summary": "快节奏的动作战斗是核心玩法，玩家在游戏中主要操控剑、矛、盾、弓等神话冷兵器与冥界怪物进行高频率的砍杀对抗。当敌人或玩家受伤时，画面会出现鲜红的血液喷涌特效和地面积血细节，但敌人死亡后通常会化为光点或烟雾迅速消散。",
-        "video_duration_str": "01:00:22",
-        "raw_events": [
-            {"start_time": "01:10", "end_time": "06:10", "level": 1, "keywords": "腹部中枪", "gif_timestamp": "05:14"},
-            {"start_time": "08:26", "end_time": "14:42", "level": 1, "keywords": "腹部中枪", "gif_timestamp": "08:58"},
-            {"start_time": "19:20", "end_time": "19:53", "level": 1, "keywords": "腹部中枪", "gif_timestamp": "19:27"},
-            {"start_time": "22:48", "end_time": "34:30", "level": 1, "keywords": "腹部中枪", "gif_timestamp": "28:12"},
-            {"start_time": "37:48", "end_time": "42:47", "level": 1, "keywords": "腹部中枪", "gif_timestamp": "42:40"},
-            {"start_time": "49:50", "end_time": "56:46", "level": 1, "keywords": "腹部中枪", "gif_timestamp": "56:37"},
-        ]
-    }
-}
-
-def time_str_to_seconds(t: str) -> int:
-    parts = t.split(":")
-    if len(parts) == 2:
-        m, s = parts
-        return int(m) * 60 + int(s)
-    elif len(parts) == 3:
-        h, m, s = parts
-        return int(h) * 3600 + int(m) * 60 + int(s)
-    return 0
+# 与 app.py 共用同一份游戏数据（data/games.json），按需加载
+GAMES_CONFIG = GAMES
+
+@st.cache_resource(show_spinner=False)
+def load_events(game_name, data_version):
+    return events_frame(GAMES_CONFIG[game_name]["raw_events"])
+
+@st.cache_resource(show_spinner=False)
+def load_index(game_name, data_version):
+    return EventIndex.from_raw_events(GAMES_CONFIG[game_name]["raw_events"])
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def build_timeline(game_name, data_version, view=None):
+    # 按 (游戏, 数据版本, 缩放窗口) 缓存；事件很多时自动合并区间或切换到 WebGL
+    total_duration_sec = time_str_to_seconds(GAMES_CONFIG[game_name]["video_duration_str"])
+    fig, _ = build_timeline_figure(
+        load_events(game_name, data_version), total_duration_sec, view,
+        hover_data={"ID": False, "level": True, "start": True, "end": True},
+        index=load_index(game_name, data_version),
+    )
+    return fig
+
+@st.cache_resource(show_spinner=False)
+def get_asset_manifest():
+    manifest = AssetManifest(GAMES_CONFIG)
+    manifest.start_watcher()
+    return manifest
 
 # =============================
 # 选择游戏
@@ -95,7 +82,7 @@ with st.container():
             font-weight: 400;
             color: #2c3e50;
         ">
-        {game_cfg["summary"]}
+        {game_cfg["summary_vis"]}
         </div>
         """,
         unsafe_allow_html=True
@@ -107,39 +94,22 @@ with st.container():
 with st.container():
     st.subheader("📊 暴力程度时间轴")
 
-    events = []
-    base_time = pd.Timestamp("1970-01-01")
-    total_duration_sec = time_str_to_seconds(game_cfg["video_duration_str"])
-    end_video_time = base_time + pd.Timedelta(seconds=total_duration_sec)
-
-    for idx, e in enumerate(game_cfg["raw_events"]):
-        events.append({
-            "ID": idx,
-            "start": base_time + pd.Timedelta(seconds=time_str_to_seconds(e["start_time"])),
-            "end": base_time + pd.Timedelta(seconds=time_str_to_seconds(e["end_time"])),
-            "level": LEVEL_MAP[e["level"]],
-            "keywords": e["keywords"],
-            "gif_timestamp_str": e["gif_timestamp"]
-        })
-
-    df = pd.DataFrame(events)
-
-    # 补充空数据确保 y 轴完整
-    for lvl in LEVEL_ORDER:
-        if df.empty or lvl not in df["level"].values:
-            df = pd.concat([df, pd.DataFrame([{"ID": -1, "start": base_time, "end": base_time + pd.Timedelta(seconds=0.1), "level": lvl, "keywords": "无事件", "gif_timestamp_str": ""}])])
-
-    df = df.reset_index(drop=True)
-
-    fig = px.timeline(
-        df, x_start="start", x_end="end", y="level", color="level",
-        category_orders={"level": LEVEL_ORDER},
-        custom_data=["ID"],
-        hover_data={"ID": False, "level": True, "start": True, "end": True}, 
-        color_discrete_map={"轻度": "#FDB462", "中度": "#FB6A4A", "重度": "#CB181D"},
-        range_x=[base_time, end_video_time]
-    )
-
+    # 框选用于放大：记录缩放窗口并按更细的粒度重新分箱，框选本身不触发播放
+    chart_state = st.session_state.get("timeline_chart", {})
+    view_key = f"view_{selected_game}"
+    box_view = box_to_view(chart_state.get("selection", {}))
+    if box_view is not None and box_view != st.session_state.get("last_box"):
+        st.session_state.last_box = box_view
+        st.session_state[view_key] = box_view
+    view = st.session_state.get(view_key)
+
+    fig = build_timeline(selected_game, GAMES_CONFIG.version, view)
+    if view is not None and st.button("↺ 重置时间轴缩放"):
+        del st.session_state[view_key]
+        st.rerun()
+
+    # 图表来自缓存，复制后再设置样式
+    fig = go.Figure(fig)
     fig.update_layout(
         height=200,
         margin=dict(l=20, r=20, t=10, b=20),
@@ -150,19 +120,28 @@ with st.container():
         legend=dict(font=dict(size=14))
     )
 
-    selected = st.plotly_chart(fig, use_container_width=True, on_select="rerun")
+    selected = st.plotly_chart(fig, use_container_width=True, on_select="rerun", key="timeline_chart")
+
+    # 悬停预览：鼠标移到方块上时显示雪碧图中该事件的一格（只加载几 KB），点击方块后才加载完整视频
+    sprite = get_asset_manifest().sprite(game_cfg["prefix"])
+    preview = hover_preview_config(
+        sprite.url, len(game_cfg["raw_events"]),
+        # 个别事件在 vis-rate-app 中的关键词与 app.py 不同，存为 keywords_vis
+        [e["keywords_vis"] or e["keywords"] for e in game_cfg["raw_events"]],
+    ) if sprite is not None else None
+    st.html(hover_preview_html(preview), unsafe_allow_javascript=True)
 
 
 
 # ======================================================
-# 🧱 区域三：事件动态预览 (终极修复版：Base64 + 强制刷新)
+# 🧱 区域三：事件动态预览 (静态 URL 流式加载)
 # ======================================================
 with st.container():
     st.subheader("🎬 事件动态预览")
 
     selected_row = None 
     selection = selected.get("selection", {})
-    points = selection.get("points", [])
+    points = [] if box_to_view(selection) is not None else selection.get("points", [])
 
     if points:
         point_data = points[0]
@@ -174,35 +153,35 @@ with st.container():
             clicked_id = int(raw_custom_data.get("0", raw_custom_data.get(0, -1)))
 
         if clicked_id != -1:
-            match = df[df["ID"] == clicked_id]
-            if not match.empty:
-                selected_row = match.iloc[0]
+            # 通过事件索引按 ID 直接定位，不再逐行扫描 DataFrame
+            selected_row = load_index(selected_game, GAMES_CONFIG.version).get(clicked_id)
 
     # --- 渲染逻辑 ---
     if selected_row is not None:
         # 【修复 NameError】：在使用变量前必须先定义它们
-        evt_id = int(selected_row["ID"])
-        prefix = game_cfg["file_prefix"]
-        ts_str = selected_row["gif_timestamp_str"]
-        gif_seconds = time_str_to_seconds(ts_str)
+        evt_id = selected_row["ID"]
+        prefix = game_cfg["prefix"]
+        gif_seconds = selected_row["gif_seconds"]
         
-        # 构造路径
-        video_filename = f"{prefix}_evt_{evt_id}_{gif_seconds}s.mp4"
-        local_video_path = os.path.join("static", "video_cache", video_filename)
-
-        if os.path.exists(local_video_path):
-            # 2. 将视频转为 Base64 字符串
-            v_base64 = get_video_base64(local_video_path)
-            
-            # 【修复不刷新问题】：添加一个随机生成的 ID，强制浏览器重新渲染 video 标签
-            refresh_key = f"{evt_id}_{int(time.time())}"
-            
+        # 从启动时建立的资源清单中取路径
+        clip = get_asset_manifest().clip(prefix, evt_id)
+        local_video_path = clip.path if clip is not None else os.path.join(CLIP_DIR, clip_filename(prefix, evt_id, gif_seconds))
+
+        if clip is not None:
+            if VIDEO_DELIVERY == "inline":
+                video_src = f"data:video/mp4;base64,{get_video_base64(local_video_path)}"
+            else:
+                # 按 URL 引用，视频不再经过 websocket 传输；src 直接写在 video 上，
+                # 切换事件时 src 变化即会重新加载，无需时间戳强制刷新
+                video_src = clip.for_width(VIDEO_DISPLAY_WIDTH).url
+            poster = get_asset_manifest().poster(prefix, evt_id)
+            poster_attr = f'poster="{poster.url}"' if poster is not None else ""
+
             st.markdown(
                 f'''
-                <div id="wrapper-{refresh_key}" style="display: flex; flex-direction: column; align-items: center;">
-                    <video key="{refresh_key}" width="1000" autoplay loop muted playsinline 
+                <div id="wrapper-{prefix}-{evt_id}" style="display: flex; flex-direction: column; align-items: center;">
+                    <video src="{video_src}" {poster_attr} width="{VIDEO_DISPLAY_WIDTH}" autoplay loop muted playsinline preload="auto"
                            style="border-radius: 10px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
-                        <source src="data:video/mp4;base64,{v_base64}" type="video/mp4">
                         您的浏览器不支持视频播放。
                     </video>
                     <p style="margin-top: 10px; font-size: 18px; text-align: center;">